@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,7 +86,10 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
-
+        # Keep connections open between requests, checking them before
+        # reuse so a restarted server does not fail the next request
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
 
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
@@ -93,6 +97,60 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Both backends are bounded by MAX_ENTRIES, local memory evicts in LRU order
+
+if os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Cache and lifetime in seconds of the tag and ingredient list responses.
+# Changes invalidate them through a per user generation counter kept in the
+# same cache, so deployments running several worker processes must point
+# the alias at a cache shared by all of them (set CACHE_DIR for the file
+# cache). With local memory a change made in one process leaves the others
+# serving stale lists for up to the timeout.
+API_RESPONSE_CACHE_ALIAS = 'default'
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+# Token authentication cache. Deleting a token or saving a user invalidates
+# its entry right away. With SHARED_CACHE_ALIAS set every process reads the
+# shared cache, so deployments running several worker processes must set
+# it; otherwise each process keeps its own entries for up to TTL seconds.
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 30)),
+    'MAX_ENTRIES': 10000,
+    'SHARED_CACHE_ALIAS': os.environ.get('TOKEN_AUTH_SHARED_CACHE'),
+    'SHARED_TTL': 300,
+}
+
+# Token buckets of login attempts per client address and per email, and
+# the number of password checks a process runs at once
+LOGIN_THROTTLE = {
+    'CACHE_ALIAS': os.environ.get('LOGIN_THROTTLE_CACHE', 'default'),
+    'IP_BURST': int(os.environ.get('LOGIN_THROTTLE_IP_BURST', 20)),
+    'IP_PER_MINUTE': int(os.environ.get('LOGIN_THROTTLE_IP_PER_MINUTE', 10)),
+    'EMAIL_BURST': int(os.environ.get('LOGIN_THROTTLE_EMAIL_BURST', 5)),
+    'EMAIL_PER_MINUTE': int(
+        os.environ.get('LOGIN_THROTTLE_EMAIL_PER_MINUTE', 1)
+    ),
+    'MAX_CONCURRENT': int(os.environ.get('LOGIN_MAX_CONCURRENT', 4)),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -136,4 +194,69 @@ MEDIA_ROOT = '/vol/web/media'
 
 STATIC_ROOT = '/vol/web/static'
 
+# How media files are sent once access to them is granted. SENDFILE is
+# empty to stream them from Django, 'x-accel-redirect' to hand them to
+# nginx through its internal location INTERNAL_URL mapped to MEDIA_ROOT,
+# or 'x-sendfile' for Apache and lighttpd.
+MEDIA_SERVING = {
+    'SENDFILE': os.environ.get('MEDIA_SENDFILE', ''),
+    'INTERNAL_URL': os.environ.get('MEDIA_INTERNAL_URL', '/protected-media/'),
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
 AUTH_USER_MODEL = 'core.User'
+
+# Background processing of uploaded recipe images. EAGER runs the jobs in
+# the request instead of the worker processes. Jobs lost with a worker or
+# a restart are picked up again by the requeue_pending_images command.
+IMAGE_PIPELINE = {
+    'WORKERS': int(os.environ.get('IMAGE_WORKERS', 2)),
+    'EAGER': os.environ.get('IMAGE_PIPELINE_EAGER') == '1',
+    'THUMBNAIL_SIZE': (256, 256),
+}
+
+# Resized and re-encoded variants of recipe images, rendered on first
+# request into DIR under MEDIA_ROOT. The least recently accessed ones are
+# removed once they take more than MAX_BYTES, down to LOW_WATER of it.
+IMAGE_RENDITIONS = {
+    'DIR': 'renditions',
+    'WIDTHS': (128, 512, 1024),
+    'QUALITIES': (60, 75, 90),
+    'DEFAULT_QUALITY': 75,
+    'MAX_BYTES': int(os.environ.get('RENDITION_CACHE_BYTES', 512 * 1024 ** 2)),
+    'LOW_WATER': 0.9,
+}
+
+# Request timing metrics, merged from the files of every worker process
+# in DIR when it is set. /metrics only answers the addresses in
+# ALLOWED_IPS, give it the address of the scraper when it is not local.
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+    'DIR': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 1,
+    'ALLOWED_IPS': os.environ.get(
+        'METRICS_ALLOWED_IPS',
+        '127.0.0.1,::1'
+    ).split(','),
+}
+
+# NUM_PROXIES is the number of proxies in front of the app. Throttles take
+# the client address from that many entries back in X-Forwarded-For, with
+# none they use REMOTE_ADDR so the header cannot be spoofed.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Default and maximum page size of the cursor paginated list endpoints
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
+# Number of recipes fetched per query while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+# Maximum number of recipes accepted by a single bulk create request
+API_MAX_BULK_SIZE = int(os.environ.get('API_MAX_BULK_SIZE', 1000))
@@ -0,0 +1,28 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def ping_database(alias=DEFAULT_DB_ALIAS):
+    """
+    Run a trivial query, raising a DatabaseError when it cannot be served
+
+    Opens the connection first when needed, or reuses the persistent one.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def close_unusable_connections(**kwargs):
+    """
+    Close persistent connections the server dropped since their last use
+
+    Done for databases with CONN_HEALTH_CHECKS, so a request starts on a
+    fresh connection instead of failing on a stale one. Django 4.1 and
+    later check these connections themselves.
+    """
+    for connection in connections.all():
+        if connection.connection is None or \
+                not connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -1,8 +1,10 @@
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS, connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import ping_database
 
 
 class Command(BaseCommand):
@@ -10,17 +12,52 @@ class Command(BaseCommand):
     Command to pause execution untill the db is connected
     """
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait before giving up'
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.1,
+            help='Seconds to wait after the first failed attempt'
+        )
+        parser.add_argument(
+            '--max-delay',
+            type=float,
+            default=5,
+            help='Longest wait between attempts'
+        )
+
     def handle(self, *args, **options):
         """
         Handle the Command
         """
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        alias = options['database']
+        delay = options['delay']
+        deadline = time.monotonic() + options['timeout']
+        while True:
             try:
-                db_conn = connections['default']
+                ping_database(alias)
+                break
             except OperationalError:
-                self.stdout.write('Database unabailable,waiting 1 second...')
-                time.sleep(1)
+                connections[alias].close()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]:g} '
+                        'seconds'
+                    )
+                wait = min(delay, remaining)
+                self.stdout.write(
+                    f'Database unavailable, waiting {wait:.1f} seconds...'
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, \
+                        HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """
+    Raised for a byte range starting past the end of the file
+    """
+
+
+def parse_range(header, size):
+    """
+    Return the inclusive (start, end) byte range of a Range header
+
+    Returns None for a missing or malformed header and for several
+    ranges, which are then answered with the whole file.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def read_range(path, start, length, block_size=FileResponse.block_size):
+    """
+    Yield `length` bytes of the file from `start` in blocks
+    """
+    with open(path, 'rb') as file_to_stream:
+        file_to_stream.seek(start)
+        while length > 0:
+            block = file_to_stream.read(min(block_size, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _file_response(request, path, size, content_type, last_modified):
+    """
+    Return the whole file or the byte range asked for by the request
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = None
+    if if_range is None or if_range == last_modified:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(path, start, end - start + 1),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+
+    return response
+
+
+def serve_file(request, root, name):
+    """
+    Return a response sending the file `name` under the `root` directory
+
+    With settings.MEDIA_SERVING['SENDFILE'] set the transfer is handed to
+    the front proxy, otherwise the file is streamed from here honouring
+    Range and If-Modified-Since. Access must be checked by the caller.
+    The files never change under a name, so they are cacheable for good.
+    """
+    config = settings.MEDIA_SERVING
+    path = safe_join(root, name)
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    last_modified = http_date(stat.st_mtime)
+
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    elif config['SENDFILE'] == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            config['INTERNAL_URL'] + os.path.relpath(path, root)
+        )
+    elif config['SENDFILE'] == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _file_response(
+            request,
+            path,
+            stat.st_size,
+            content_type,
+            last_modified
+        )
+    if response.status_code != 416:
+        response['Last-Modified'] = last_modified
+        response['Cache-Control'] = \
+            f'private, max-age={config["MAX_AGE"]}, immutable'
+
+    return response
@@ -0,0 +1,229 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        'Time spent handling the request', SECONDS_BUCKETS),
+    'http_request_view_seconds': (
+        'Time spent in the view, SQL included', SECONDS_BUCKETS),
+    'http_request_render_seconds': (
+        'Time spent rendering the response', SECONDS_BUCKETS),
+    'http_request_sql_seconds': (
+        'Time spent executing SQL', SECONDS_BUCKETS),
+    'http_request_sql_queries': (
+        'SQL queries executed', QUERY_BUCKETS),
+}
+COUNTERS = {
+    'http_requests_total': 'Requests handled',
+}
+
+
+def _key(name, labels):
+    """
+    Return a hashable key of a metric and its labels
+    """
+    return name, tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Thread safe per process store of request histograms and counters
+
+    With settings.METRICS['DIR'] set, the process periodically writes its
+    values to a file of its own in that directory, so that a scrape served
+    by any worker can merge the values of all of them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._flushed_at = 0
+
+    def observe(self, name, labels, value):
+        """
+        Record a value in the histogram of the metric and labels
+        """
+        buckets = HISTOGRAMS[name][1]
+        with self._lock:
+            key = _key(name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': [0] * (len(buckets) + 1),
+                    'sum': 0,
+                    'count': 0,
+                }
+            index = next(
+                (i for i, bound in enumerate(buckets) if value <= bound),
+                len(buckets)
+            )
+            histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def increment(self, name, labels, value=1):
+        """
+        Add the value to the counter of the metric and labels
+        """
+        with self._lock:
+            key = _key(name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        """
+        Return the values of the process as a JSON serializable dict
+        """
+        with self._lock:
+            return {
+                'histograms': [
+                    [name, dict(labels), dict(histogram,
+                                              buckets=histogram['buckets'][:])]
+                    for (name, labels), histogram in self._histograms.items()
+                ],
+                'counters': [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self._counters.items()
+                ],
+            }
+
+    def clear(self):
+        """
+        Forget every value of the process
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def flush(self, force=False):
+        """
+        Write the values of the process to its file in the metrics dir
+
+        Writes at most once per FLUSH_INTERVAL unless forced. The file is
+        replaced atomically so a concurrent scrape never reads half of it.
+        """
+        directory = settings.METRICS['DIR']
+        now = time.monotonic()
+        if not directory or (
+                not force and
+                now - self._flushed_at < settings.METRICS['FLUSH_INTERVAL']):
+            return
+        self._flushed_at = now
+
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(
+            path,
+            os.path.join(directory, f'metrics-{os.getpid()}.json')
+        )
+
+    def collect(self):
+        """
+        Return the snapshots of every process, this one included
+        """
+        directory = settings.METRICS['DIR']
+        if not directory:
+            return [self.snapshot()]
+
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    snapshots.append(json.load(snapshot_file))
+            except (OSError, ValueError):
+                continue
+
+        return snapshots
+
+
+def merge(snapshots):
+    """
+    Sum the histograms and counters of the snapshots by metric and labels
+    """
+    histograms, counters = {}, {}
+    for snapshot in snapshots:
+        for name, labels, histogram in snapshot['histograms']:
+            merged = histograms.setdefault(_key(name, labels), {
+                'buckets': [0] * len(histogram['buckets']),
+                'sum': 0,
+                'count': 0,
+            })
+            merged['buckets'] = [
+                a + b for a, b in zip(merged['buckets'], histogram['buckets'])
+            ]
+            merged['sum'] += histogram['sum']
+            merged['count'] += histogram['count']
+        for name, labels, value in snapshot['counters']:
+            key = _key(name, labels)
+            counters[key] = counters.get(key, 0) + value
+
+    return histograms, counters
+
+
+def _format_labels(labels, **extra):
+    """
+    Return the labels in the Prometheus text format
+    """
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('"', r'\"')
+         .replace('\n', r'\n'))
+        for name, value in items
+    )
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render(snapshots):
+    """
+    Return the merged snapshots in the Prometheus text exposition format
+    """
+    histograms, counters = merge(snapshots)
+    lines = []
+    for name, (description, bounds) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds + ('+Inf',),
+                                    histogram['buckets']):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{_format_labels(labels, le=bound)} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{name}_sum{_format_labels(labels)} {histogram["sum"]}'
+            )
+            lines.append(
+                f'{name}_count{_format_labels(labels)} {histogram["count"]}'
+            )
+    for name, description in COUNTERS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,116 @@
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.conf import settings
+from django.db import connections
+
+from core.metrics import registry
+
+
+class RequestTiming:
+    """
+    Timings of one request, collected by RequestTimingMiddleware
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.render_finished = None
+        self.sql_time = 0
+        self.sql_count = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting and timing the queries
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+
+    def rendered(self, response):
+        """
+        Post render callback marking the end of rendering
+        """
+        self.render_finished = time.perf_counter()
+
+
+class RequestTimingMiddleware:
+    """
+    Middleware timing SQL, the view and rendering of every request
+
+    The timings are sent back in a Server-Timing header and recorded per
+    route in the metrics registry. It should come first in MIDDLEWARE so
+    the total covers the other middleware too.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = request.timing = RequestTiming()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.execute_wrapper)
+                )
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        if timing.view_finished is None:
+            timing.view_finished = finished
+        view_time = timing.view_finished - \
+            (timing.view_started or timing.view_finished)
+        render_time = 0
+        if timing.render_finished is not None:
+            render_time = timing.render_finished - timing.view_finished
+        total_time = finished - timing.started
+
+        response['Server-Timing'] = ', '.join((
+            f'sql;dur={timing.sql_time * 1000:.2f};'
+            f'desc="{timing.sql_count} queries"',
+            f'view;dur={view_time * 1000:.2f}',
+            f'render;dur={render_time * 1000:.2f}',
+            f'total;dur={total_time * 1000:.2f}',
+        ))
+        self.record(request, response, {
+            'http_request_duration_seconds': total_time,
+            'http_request_view_seconds': view_time,
+            'http_request_render_seconds': render_time,
+            'http_request_sql_seconds': timing.sql_time,
+            'http_request_sql_queries': timing.sql_count,
+        })
+
+        return response
+
+    def record(self, request, response, values):
+        """
+        Record the timings in the histograms of the route of the request
+        """
+        match = request.resolver_match
+        labels = {
+            'route': match.view_name if match else 'unmatched',
+            'method': request.method,
+        }
+        for name, value in values.items():
+            registry.observe(name, labels, value)
+        registry.increment(
+            'http_requests_total',
+            dict(labels, status=response.status_code)
+        )
+        registry.flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request.timing.view_finished = time.perf_counter()
+        response.add_post_render_callback(request.timing.rendered)
+
+        return response
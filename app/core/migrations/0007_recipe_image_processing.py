@@ -0,0 +1,34 @@
+# Generated by Django 2.2 on 2026-10-18 08:55
+
+import core.models
+from django.db import migrations, models
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image__isnull=True).exclude(image='') \
+        .update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=16),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='thumbnail',
+            field=models.ImageField(editable=False, null=True, upload_to=core.models.recipe_thumbnail_file_path),
+        ),
+        migrations.RunPython(
+            mark_existing_images_ready,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2 on 2026-10-18 08:57
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_SQL = [
+    "CREATE INDEX core_recipe_search_vector_idx "
+    "ON core_recipe USING gin (search_vector)",
+    "CREATE TRIGGER core_recipe_search_vector_update "
+    "BEFORE INSERT OR UPDATE OF title ON core_recipe "
+    "FOR EACH ROW EXECUTE PROCEDURE "
+    "tsvector_update_trigger(search_vector, 'pg_catalog.english', title)",
+    "UPDATE core_recipe "
+    "SET search_vector = to_tsvector('pg_catalog.english', title)",
+]
+
+REVERSE_SEARCH_SQL = [
+    "DROP TRIGGER core_recipe_search_vector_update ON core_recipe",
+    "DROP INDEX core_recipe_search_vector_idx",
+]
+
+
+def run_on_postgresql(statements):
+    """
+    Return a RunPython callable executing the statements on PostgreSQL only
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(SEARCH_SQL),
+            run_on_postgresql(REVERSE_SEARCH_SQL),
+        ),
+    ]
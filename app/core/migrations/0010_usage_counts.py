@@ -0,0 +1,47 @@
+# Generated by Django 2.2 on 2026-10-18 09:02
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field, column in (('tags', 'tag_id'), ('ingredients', 'ingredient_id')):
+        relation = getattr(Recipe, field)
+        counts = relation.through.objects \
+            .filter(**{column: OuterRef('pk')}) \
+            .order_by().values(column) \
+            .annotate(count=Count('recipe_id')).values('count')
+        relation.rel.model.objects.update(usage_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()), 0
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_modification_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-usage_count'], name='core_ingredient_user_usage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-usage_count'], name='core_tag_user_usage_idx'),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
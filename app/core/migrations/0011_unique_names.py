@@ -0,0 +1,66 @@
+# Generated by Django 2.2 on 2026-10-18 09:17
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field, column in (('tags', 'tag_id'), ('ingredients', 'ingredient_id')):
+        relation = getattr(Recipe, field)
+        model = relation.rel.model
+        duplicates = model.objects.values('user_id', 'name') \
+            .annotate(keep=Min('id'), count=Count('id')) \
+            .filter(count__gt=1)
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            others = model.objects.filter(
+                user_id=duplicate['user_id'],
+                name=duplicate['name']
+            ).exclude(id=keep)
+            links = relation.through.objects
+            linked = set(
+                links.filter(**{column: keep})
+                .values_list('recipe_id', flat=True)
+            )
+            for link in links.filter(**{f'{column}__in': others}):
+                if link.recipe_id in linked:
+                    link.delete()
+                else:
+                    setattr(link, column, keep)
+                    link.save()
+                    linked.add(link.recipe_id)
+            others.delete()
+            model.objects.filter(id=keep).update(usage_count=len(linked))
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # Run the foreign key checks deferred by the deletes now, pending
+        # trigger events keep the constraints below from being added
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_usage_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingredient_user_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_user_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_ingredient_user_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_tag_user_name_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_deleted_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
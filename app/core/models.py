@@ -1,10 +1,16 @@
 import uuid
 import os
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
 
+from core.storage import ContentAddressedStorage
+
+# Recipe images and thumbnails are stored once per distinct content
+content_storage = ContentAddressedStorage()
+
 
 def recipe_image_file_path(instance, filename):
     """
@@ -16,6 +22,15 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+def recipe_thumbnail_file_path(instance, filename):
+    """
+    Generate file path for new recipe image thumbnail
+    """
+    filename = f'{uuid.uuid4()}.jpg'
+
+    return os.path.join('uploads/recipe/thumbnails/', filename)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -53,6 +68,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # When the user last deleted a recipe, part of the recipe list ETag
+    recipes_deleted_at = models.DateTimeField(null=True, editable=False)
 
     objects = UserManager()
     USERNAME_FIELD = 'email'
@@ -67,6 +84,25 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of recipes using the tag, kept up to date by signals
+    usage_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Names are unique per user so they can be used to get or create
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_tag_user_name_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-usage_count'],
+                name='core_tag_user_usage_idx'
+            ),
+        ]
 
     def __str__(self):
         """
@@ -85,6 +121,25 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of recipes using the ingredient, kept up to date by signals
+    usage_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Names are unique per user so they can be used to get or create
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-usage_count'],
+                name='core_ingredient_user_usage_idx'
+            ),
+        ]
 
     def __str__(self):
         """
@@ -98,6 +153,15 @@ class Recipe(models.Model):
     """
     Mpdel class for the recipe objects
     """
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -108,10 +172,54 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        max_length=255,
+        upload_to=recipe_image_file_path,
+        storage=content_storage
+    )
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True
+    )
+    thumbnail = models.ImageField(
+        null=True,
+        editable=False,
+        max_length=255,
+        upload_to=recipe_thumbnail_file_path,
+        storage=content_storage
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained from the title by a database trigger on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
 
     def __str__(self):
         """
         String representation of the recipe model
         """
         return self.title
+
+
+class StoredFile(models.Model):
+    """
+    Number of references to a file of the content addressed storage
+    """
+    name = models.CharField(max_length=255, unique=True)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """
+        String representation of the stored file
+        """
+        return self.name
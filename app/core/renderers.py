@@ -0,0 +1,45 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer using orjson when available
+
+    The output is byte for byte what JSONRenderer produces for compact,
+    unicode output. Pretty printed or ASCII only responses and data orjson
+    cannot encode fall back to JSONRenderer.
+    """
+
+    def _default(self, obj):
+        """
+        Encode types orjson does not know the way JSONRenderer does
+        """
+        return self.encoder_class().default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        if orjson is None or data is None or self.ensure_ascii or \
+                not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self._default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict javascript subset, like JSONRenderer
+        return ret.replace('\u2028'.encode('utf-8'), b'\\u2028') \
+            .replace('\u2029'.encode('utf-8'), b'\\u2029')
@@ -0,0 +1,12 @@
+import django
+from django.core.signals import request_started
+
+from core.health import close_unusable_connections
+
+
+def connect():
+    """
+    Connect the database connection health check
+    """
+    if django.VERSION < (4, 1):
+        request_started.connect(close_unusable_connections)
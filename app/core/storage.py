@@ -0,0 +1,127 @@
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+INCOMING_DIR = 'incoming'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming files after the SHA-256 of their content
+
+    Uploads are hashed while they are streamed to a temporary file, then
+    moved to `<dir>/<ab>/<cd>/<hash><ext>` where `<dir>` and `<ext>` come
+    from the name given by upload_to. Identical content therefore ends up
+    in one file, which never changes once written.
+
+    Every save takes a reference on the file in the StoredFile table and
+    every delete releases one, the file itself is removed once the last
+    reference is released and that release is committed.
+    """
+
+    @property
+    def stored_files(self):
+        # Looked up lazily as the models module imports this one
+        return apps.get_model('core', 'StoredFile').objects
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Return the name unchanged, the final name is chosen by _save
+        """
+        return name
+
+    def _makedirs(self, directory):
+        """
+        Create the directory and its parents with the configured mode
+        """
+        mode = self.directory_permissions_mode
+        os.makedirs(directory, 0o777 if mode is None else mode, exist_ok=True)
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        incoming = self.path(INCOMING_DIR)
+        self._makedirs(incoming)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                directory,
+                hexdigest[:2],
+                hexdigest[2:4],
+                hexdigest + ext
+            )
+
+            # The reference is taken first, its row lock keeps a concurrent
+            # release of the last reference from removing the file under us
+            with transaction.atomic():
+                self.acquire(name)
+                path = self.path(name)
+                if not os.path.exists(path):
+                    self._makedirs(os.path.dirname(path))
+                    mode = self.file_permissions_mode
+                    os.chmod(tmp_path, 0o644 if mode is None else mode)
+                    os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return name.replace('\\', '/')
+
+    def acquire(self, name):
+        """
+        Take a reference on the stored file
+        """
+        files = self.stored_files.filter(name=name)
+        if files.update(references=F('references') + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.stored_files.create(name=name, references=1)
+        except IntegrityError:
+            # Created concurrently, which also waited for the row lock
+            files.update(references=F('references') + 1)
+
+    def delete(self, name):
+        """
+        Release a reference on the file, removing it with the last one
+
+        Files saved before the storage kept references have no row and
+        a single owner, they are removed right away.
+        """
+        assert name, 'The name argument is not allowed to be empty.'
+        with transaction.atomic():
+            stored = self.stored_files.select_for_update() \
+                .filter(name=name).first()
+            if stored is None:
+                super().delete(name)
+                return
+            self.stored_files.filter(pk=stored.pk).update(
+                references=max(stored.references - 1, 0)
+            )
+            if stored.references <= 1:
+                transaction.on_commit(lambda: self.purge(name))
+
+    def purge(self, name):
+        """
+        Remove the file if it is still without references
+        """
+        with transaction.atomic():
+            stored = self.stored_files.select_for_update() \
+                .filter(name=name, references=0).first()
+            if stored is not None:
+                stored.delete()
+                super().delete(name)
@@ -1,27 +1,40 @@
-from unittest.mock import patch
+from unittest.mock import call, patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
 
+@patch('core.management.commands.wait_for_db.ping_database')
 class CommansTest(TestCase):
 
-    def test_wait_for_db_ready(self):
+    def test_wait_for_db_ready(self, ping):
         """
         Test waiting fordb when db is available
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        call_command('wait_for_db')
+        self.assertEqual(ping.call_count, 1)
 
     @patch('time.sleep', return_value=None)
-    def test_wait_for_db(self, ts):
+    def test_wait_for_db(self, ts, ping):
         """
-        Test waiting for db
+        Test waiting for db backs off exponentially up to the max delay
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        ping.side_effect = [OperationalError] * 5 + [None]
+        call_command('wait_for_db', max_delay=1)
+        self.assertEqual(ping.call_count, 6)
+        self.assertEqual(
+            ts.call_args_list,
+            [call(0.1), call(0.2), call(0.4), call(0.8), call(1)]
+        )
+
+    @patch('time.sleep', return_value=None)
+    def test_wait_for_db_timeout(self, ts, ping):
+        """
+        Test waiting for db gives up after the timeout
+        """
+        ping.side_effect = OperationalError
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0)
+        ts.assert_not_called()
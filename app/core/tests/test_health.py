@@ -0,0 +1,77 @@
+from unittest.mock import Mock, patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.health import close_unusable_connections
+
+READINESS_URL = reverse('readiness')
+
+
+class ReadinessTests(TestCase):
+    """
+    Test the readiness endpoint
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_ready(self):
+        """
+        Test the endpoint answers 200 without authentication
+        """
+        with self.assertNumQueries(1):
+            res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'status': 'ready'})
+
+    @patch('core.views.ping_database', side_effect=OperationalError)
+    def test_database_unavailable(self, ping):
+        """
+        Test the endpoint answers 503 when the database cannot be reached
+        """
+        res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json(), {'status': 'unavailable'})
+
+
+class ConnectionHealthCheckTests(TestCase):
+    """
+    Test persistent connections are checked before a request uses them
+    """
+
+    def connection(self, usable=True, health_checks=True, opened=True):
+        """
+        Return a mock database connection
+        """
+        return Mock(
+            connection=Mock() if opened else None,
+            settings_dict={'CONN_HEALTH_CHECKS': health_checks},
+            is_usable=Mock(return_value=usable)
+        )
+
+    def test_unusable_connections_closed(self):
+        """
+        Test only opened, checked and unusable connections are closed
+        """
+        broken = self.connection(usable=False)
+        healthy = self.connection()
+        unchecked = self.connection(usable=False, health_checks=False)
+        closed = self.connection(usable=False, opened=False)
+        connections = [broken, healthy, unchecked, closed]
+
+        with patch('core.health.connections') as handler:
+            handler.all.return_value = connections
+            close_unusable_connections()
+
+        broken.close.assert_called_once_with()
+        for connection in (healthy, unchecked, closed):
+            connection.close.assert_not_called()
+        unchecked.is_usable.assert_not_called()
+        closed.is_usable.assert_not_called()
@@ -0,0 +1,124 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.metrics import MetricsRegistry, registry, render
+
+RECIPES_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+
+class RequestTimingTests(TestCase):
+    """
+    Test the request timing middleware and the metrics endpoint
+    """
+
+    def setUp(self):
+        registry.clear()
+        self.user = get_user_model().objects.create_user(
+            'test@admin.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """
+        Test responses report SQL, view and render time
+        """
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertRegex(
+            res['Server-Timing'],
+            r'^sql;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, '
+            r'render;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    def test_metrics_per_route(self):
+        """
+        Test the metrics endpoint exposes histograms labelled by route
+        """
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        labels = 'method="GET",route="recipe:recipe-list"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 2',
+            body
+        )
+        self.assertIn(
+            f'http_request_sql_queries_bucket{{{labels},le="+Inf"}} 2',
+            body
+        )
+        self.assertIn(
+            f'http_requests_total{{{labels},status="200"}} 2',
+            body
+        )
+
+    def test_metrics_refused_to_other_addresses(self):
+        """
+        Test the metrics are only served to the allowed addresses
+        """
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        metrics = dict(settings.METRICS, ALLOWED_IPS=['203.0.113.7'])
+        with override_settings(METRICS=metrics):
+            res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_metrics_merged_across_processes(self):
+        """
+        Test the files written by other processes are summed on scrape
+        """
+        other = MetricsRegistry()
+        labels = {'route': 'recipe:recipe-list', 'method': 'GET'}
+        other.observe('http_request_sql_queries', labels, 3)
+        other.increment('http_requests_total', dict(labels, status=200))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'metrics-1.json'), 'w') as f:
+                json.dump(other.snapshot(), f)
+            metrics = dict(settings.METRICS, DIR=directory)
+            with override_settings(METRICS=metrics):
+                self.client.get(RECIPES_URL)
+                res = self.client.get(METRICS_URL)
+                files = sorted(os.listdir(directory))
+
+        body = res.content.decode()
+        self.assertEqual(
+            files,
+            ['metrics-1.json', f'metrics-{os.getpid()}.json']
+        )
+        self.assertIn(
+            'http_requests_total{method="GET",route="recipe:recipe-list",'
+            'status="200"} 2',
+            body
+        )
+
+    def test_render_escapes_labels(self):
+        """
+        Test label values are escaped in the text format
+        """
+        metrics = MetricsRegistry()
+        metrics.increment('http_requests_total', {'route': 'a"b\\c'})
+
+        self.assertIn(
+            'http_requests_total{route="a\\"b\\\\c"} 1',
+            render([metrics.snapshot()])
+        )
@@ -0,0 +1,55 @@
+import datetime
+import decimal
+import uuid
+from collections import OrderedDict
+
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTests(TestCase):
+    """
+    Test the orjson backed renderer matches JSONRenderer
+    """
+
+    def test_render_matches_json_renderer(self):
+        """
+        Test common API data renders to the same bytes
+        """
+        data = OrderedDict([
+            ('id', 1),
+            ('title', 'Crème brûlée\u2028\u2029'),
+            ('price', decimal.Decimal('5.50')),
+            ('created_at', datetime.datetime(
+                2019, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc
+            )),
+            ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+            ('tags', [1, 2]),
+            ('link', None),
+            ('ratio', 0.1),
+        ])
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_render_indented_falls_back(self):
+        """
+        Test requesting an indent renders like JSONRenderer
+        """
+        data = {'id': 1, 'tags': [1, 2]}
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    def test_render_none(self):
+        """
+        Test rendering no data returns an empty body
+        """
+        self.assertEqual(FastJSONRenderer().render(None), b'')
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TransactionTestCase, override_settings
+
+from core.models import Recipe, StoredFile, content_storage
+
+
+class ContentAddressedStorageTests(TransactionTestCase):
+    """
+    Test the content addressed storage of recipe images
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def save(self, content, name='uploads/recipe/upload.JPG'):
+        return content_storage.save(name, ContentFile(content))
+
+    def references(self, name):
+        return StoredFile.objects.get(name=name).references
+
+    def test_saved_under_sharded_hash(self):
+        """
+        Test files are named after the hash of their content
+        """
+        name = self.save(b'image')
+
+        digest = hashlib.sha256(b'image').hexdigest()
+        self.assertEqual(
+            name,
+            f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        with content_storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'image')
+        self.assertEqual(os.listdir(content_storage.path('incoming')), [])
+
+    def test_identical_content_shared(self):
+        """
+        Test identical uploads share one file holding a reference each
+        """
+        name1 = self.save(b'image')
+        name2 = self.save(b'image', 'uploads/recipe/other.jpg')
+        name3 = self.save(b'other image')
+
+        self.assertEqual(name1, name2)
+        self.assertNotEqual(name1, name3)
+        self.assertEqual(self.references(name1), 2)
+        self.assertEqual(self.references(name3), 1)
+
+    def test_file_removed_with_last_reference(self):
+        """
+        Test the file is only removed once every reference is released
+        """
+        name = self.save(b'image')
+        self.save(b'image')
+
+        content_storage.delete(name)
+        self.assertTrue(content_storage.exists(name))
+        self.assertEqual(self.references(name), 1)
+
+        content_storage.delete(name)
+        self.assertFalse(content_storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_untracked_file_removed(self):
+        """
+        Test files stored before references were kept are removed
+        """
+        name = 'uploads/recipe/legacy.jpg'
+        os.makedirs(content_storage.path('uploads/recipe'))
+        with open(content_storage.path(name), 'wb') as legacy:
+            legacy.write(b'image')
+
+        content_storage.delete(name)
+
+        self.assertFalse(content_storage.exists(name))
+
+    def test_recipe_delete_releases_files(self):
+        """
+        Test deleting a recipe releases its image and thumbnail
+        """
+        user = get_user_model().objects.create_user('user@admin.com', 'pass')
+        recipes = [
+            Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=5,
+                price=5.00
+            )
+            for i in range(2)
+        ]
+        for recipe in recipes:
+            recipe.image.save('photo.jpg', ContentFile(b'image'))
+            recipe.thumbnail.save('thumbnail.jpg', ContentFile(b'thumb'))
+        image, thumbnail = recipes[0].image.name, recipes[0].thumbnail.name
+
+        recipes[0].delete()
+        self.assertTrue(content_storage.exists(image))
+        self.assertEqual(self.references(thumbnail), 1)
+
+        recipes[1].delete()
+        self.assertFalse(content_storage.exists(image))
+        self.assertFalse(content_storage.exists(thumbnail))
+        self.assertFalse(StoredFile.objects.exists())
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.http import require_GET
+
+from core import metrics as core_metrics
+from core.health import ping_database
+
+
+@require_GET
+def metrics(request):
+    """
+    Return the request metrics of every worker in the Prometheus format
+
+    Only served to the addresses in settings.METRICS['ALLOWED_IPS'].
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS['ALLOWED_IPS']:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        core_metrics.render(core_metrics.registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@require_GET
+def readiness(request):
+    """
+    Return 200 when the database answers queries and 503 otherwise
+    """
+    try:
+        ping_database()
+    except DatabaseError:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+
+    return JsonResponse({'status': 'ready'})
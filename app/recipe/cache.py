@@ -0,0 +1,68 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def response_cache():
+    """
+    Return the cache backend used for API list responses
+    """
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
+
+
+def _generation_key(user_id):
+    """
+    Return the cache key of the generation counter of a user
+    """
+    return f'recipe:generation:{user_id}'
+
+
+def _new_generation():
+    """
+    Return a fresh generation that never collides with an evicted one
+    """
+    return int(time.time() * 1000000)
+
+
+def get_generation(user_id):
+    """
+    Return the current cache generation for the user
+    """
+    cache = response_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = _new_generation()
+        cache.add(key, generation, None)
+        generation = cache.get(key, generation)
+
+    return generation
+
+
+def bump_generation(user_id):
+    """
+    Invalidate every cached list response of the user
+    """
+    cache = response_cache()
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), None)
+
+
+def list_response_key(request, prefix, assigned_only):
+    """
+    Return the cache key of a list response for the requesting user
+    """
+    generation = get_generation(request.user.pk)
+    digest = hashlib.md5(
+        request.build_absolute_uri().encode('utf-8')
+    ).hexdigest()
+
+    return (
+        f'recipe:{prefix}:{request.user.pk}:{generation}:'
+        f'{int(assigned_only)}:{digest}'
+    )
@@ -0,0 +1,119 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from core.models import Tag, Ingredient
+from recipe.usage import USAGE_MODELS
+
+# Last modification time of an empty list nothing was ever deleted from
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _etag(request, *parts):
+    """
+    Return a strong ETag for the requested URL and the given state
+    """
+    value = ':'.join(
+        [str(request.user.pk), request.get_full_path()] +
+        [str(part) for part in parts]
+    )
+
+    return '"%s"' % hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def _last_related_update(model):
+    """
+    Return a subquery of the latest update of the recipe's tags/ingredients
+    """
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .order_by('-updated_at')
+        .values('updated_at')[:1]
+    )
+
+
+def list_validators(request, queryset, expand=()):
+    """
+    Return the ETag and last modification time of a list of recipes
+
+    Both come from an aggregate over the filtered queryset and the time
+    the user last deleted a recipe, all stored in the database, so
+    every worker computes the same ones and they change whenever a recipe
+    is added, edited or removed. Relations in expand are nested in the
+    list, so their modification times count too.
+    """
+    stats = queryset.order_by().aggregate(
+        last_modified=Max('updated_at'),
+        deleted=Max('user__recipes_deleted_at'),
+        count=Count('id')
+    )
+    count = stats.pop('count')
+    # A query per relation over the objects linked to the recipes, as
+    # joining both relations would multiply their rows and subqueries
+    # inside the aggregate break on annotated (filtered) querysets
+    recipe_ids = queryset.order_by().values('id')
+    for field in expand:
+        stats[f'{field}_modified'] = USAGE_MODELS[field].objects \
+            .filter(recipe__in=recipe_ids) \
+            .aggregate(modified=Max('updated_at'))['modified']
+    last_modified = max(
+        (value for value in stats.values() if value is not None),
+        default=EPOCH
+    )
+
+    etag = _etag(request, count, last_modified.isoformat())
+
+    return etag, last_modified
+
+
+def detail_validators(request, queryset):
+    """
+    Return the ETag and last modification time of a single recipe
+
+    Nested tags and ingredients are part of the detail representation so
+    their modification times are taken into account, None is returned
+    when the recipe does not exist.
+    """
+    row = queryset.order_by().annotate(
+        tags_modified=_last_related_update(Tag),
+        ingredients_modified=_last_related_update(Ingredient)
+    ).values('updated_at', 'tags_modified', 'ingredients_modified').first()
+    if row is None:
+        return None, None
+
+    last_modified = max(value for value in row.values() if value)
+
+    return _etag(request, last_modified.isoformat()), last_modified
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Return a 304 response if the client's copy is current, else None
+    """
+    if etag is None:
+        return None
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp())
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Add the conditional request headers to a response
+    """
+    if etag is None:
+        return
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Authorization',))
@@ -0,0 +1,58 @@
+import csv
+import json
+from itertools import islice
+
+from recipe.serializers import RecipeValuesSerializer
+
+
+def iter_recipes(queryset, chunk_size):
+    """
+    Yield the recipes of the queryset as API dicts, chunk by chunk
+
+    Only one chunk of rows and their relations is held in memory at a
+    time, so memory use does not depend on the size of the queryset.
+    """
+    serializer = RecipeValuesSerializer()
+    rows = queryset.values(*serializer.columns) \
+        .iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serializer.to_representation(chunk)
+
+
+def ndjson_lines(recipes):
+    """
+    Yield the recipes encoded as newline delimited JSON
+    """
+    for recipe in recipes:
+        yield json.dumps(recipe, ensure_ascii=False, separators=(',', ':'))
+        yield '\n'
+
+
+class _Echo:
+    """
+    File like object returning what is written, for csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(recipes):
+    """
+    Yield the recipes encoded as CSV rows with a header
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(RecipeValuesSerializer.fields)
+    for recipe in recipes:
+        for field, _ in RecipeValuesSerializer.relations:
+            recipe[field] = ','.join(str(pk) for pk in recipe[field])
+        yield writer.writerow(recipe.values())
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
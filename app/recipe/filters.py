@@ -0,0 +1,73 @@
+from django.db.models import Count, Exists, IntegerField, OuterRef, \
+                             Subquery
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+from recipe.search import search_recipes
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+RELATION_COLUMNS = {'tags': 'tag_id', 'ingredients': 'ingredient_id'}
+
+
+def params_to_ids(field, value):
+    """
+    Convert a comma separated string of ids into a list of integer ids
+    """
+    try:
+        return [int(str_id) for str_id in value.split(',')]
+    except ValueError:
+        raise ValidationError({field: ['Expected comma separated ids.']})
+
+
+def filter_by_related(queryset, field, ids, match=MATCH_ANY):
+    """
+    Filter recipes by their tags or ingredients without duplicating rows
+
+    The relation is tested with a correlated subquery on the through table
+    instead of a join, so every recipe is returned at most once and the
+    cost does not multiply when several relations are filtered on.
+    """
+    column = RELATION_COLUMNS[field]
+    links = getattr(Recipe, field).through.objects.filter(
+        recipe_id=OuterRef('pk'),
+        **{f'{column}__in': ids}
+    )
+    if match == MATCH_ALL:
+        matched = links.order_by().values('recipe_id') \
+            .annotate(matched=Count(column)).values('matched')
+        annotation = f'{field}_matched'
+        return queryset.annotate(**{
+            annotation: Subquery(matched, output_field=IntegerField())
+        }).filter(**{annotation: len(set(ids))})
+
+    annotation = f'has_{field}'
+    return queryset.annotate(**{annotation: Exists(links)}) \
+        .filter(**{annotation: True})
+
+
+def filter_recipes(queryset, params):
+    """
+    Apply the recipe list query parameters to a recipe queryset
+
+    Supports q for full text search, tags and ingredients as comma
+    separated ids, and match=any|all deciding whether a recipe needs one
+    or every one of the given ids.
+    """
+    match = params.get('match', MATCH_ANY)
+    if match not in MATCH_MODES:
+        raise ValidationError(
+            {'match': [f'Choose one of {", ".join(MATCH_MODES)}.']}
+        )
+
+    search = params.get('q')
+    if search:
+        queryset = search_recipes(queryset, search)
+    for field in RELATION_COLUMNS:
+        value = params.get(field)
+        if value:
+            ids = params_to_ids(field, value)
+            queryset = filter_by_related(queryset, field, ids, match)
+
+    return queryset
@@ -0,0 +1,114 @@
+from io import BytesIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe import workers
+
+# EXIF orientation tag values mapped to the transposition undoing them
+EXIF_ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+
+def normalize_orientation(image):
+    """
+    Return the image rotated upright according to its EXIF orientation
+    """
+    get_exif = getattr(image, '_getexif', None)
+    exif = get_exif() if get_exif else None
+    orientation = (exif or {}).get(EXIF_ORIENTATION_TAG)
+    if orientation not in ORIENTATION_TRANSPOSE:
+        return image
+
+    return image.transpose(ORIENTATION_TRANSPOSE[orientation])
+
+
+def make_thumbnail(image):
+    """
+    Return the JPEG encoded thumbnail of the image
+    """
+    thumbnail = image.convert('RGB')
+    thumbnail.thumbnail(settings.IMAGE_PIPELINE['THUMBNAIL_SIZE'])
+    output = BytesIO()
+    thumbnail.save(output, format='JPEG', quality=85)
+
+    return ContentFile(output.getvalue())
+
+
+def _mark_failed(recipe_id, image_name, **fields):
+    """
+    Mark the image of the recipe as failed unless it was replaced
+    """
+    Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_status=Recipe.IMAGE_FAILED,
+        updated_at=timezone.now(),
+        **fields
+    )
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Verify an uploaded recipe image and generate its thumbnail
+
+    Any failure marks the image as failed rather than leaving it pending,
+    unexpected ones are raised again for the worker to log.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id, image=image_name).first()
+    if recipe is None:
+        # The recipe was deleted or got a newer image in the meantime
+        return
+
+    try:
+        with recipe.image.open('rb') as image_file:
+            Image.open(image_file).verify()
+            image_file.seek(0)
+            image = Image.open(image_file)
+            image.load()
+    except (IOError, SyntaxError, ValueError, Image.DecompressionBombError):
+        recipe.image.delete(save=False)
+        _mark_failed(recipe_id, image_name, image=None)
+        return
+    except Exception:
+        _mark_failed(recipe_id, image_name)
+        raise
+
+    try:
+        image = normalize_orientation(image)
+        recipe.thumbnail.save(
+            'thumbnail.jpg',
+            make_thumbnail(image),
+            save=False
+        )
+        updated = Recipe.objects.filter(
+            id=recipe_id,
+            image=image_name
+        ).update(
+            thumbnail=recipe.thumbnail.name,
+            image_status=Recipe.IMAGE_READY,
+            updated_at=timezone.now()
+        )
+    except Exception:
+        if recipe.thumbnail:
+            recipe.thumbnail.delete(save=False)
+        _mark_failed(recipe_id, image_name)
+        raise
+    if not updated:
+        recipe.thumbnail.delete(save=False)
+
+
+def schedule_image_processing(recipe):
+    """
+    Queue the processing of the recipe's freshly uploaded image
+    """
+    workers.submit(process_recipe_image, recipe.id, recipe.image.name)
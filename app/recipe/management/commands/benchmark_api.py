@@ -0,0 +1,336 @@
+import io
+import json
+import math
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver, reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+NAMESPACES = ('recipe', 'user')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, p):
+    """
+    Return the nearest rank percentile of the values
+    """
+    values = sorted(values)
+
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def route_names():
+    """
+    Return the namespaced names of the routes of the benchmarked apps
+    """
+    names = set()
+    resolver = get_resolver()
+    for namespace in NAMESPACES:
+        _, sub_resolver = resolver.namespace_dict[namespace]
+        names.update(
+            f'{namespace}:{name}' for name in sub_resolver.reverse_dict
+            if isinstance(name, str)
+        )
+
+    return names
+
+
+class Command(BaseCommand):
+    """
+    Command to load test the API routes and record their costs
+    """
+    help = (
+        'Drive every route of the recipe and user APIs through the test '
+        'client as an existing user and write the latency percentiles, '
+        'queries per request and peak memory of each to a JSON file. '
+        'Every change is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User the requests are made as')
+        parser.add_argument('--password', default='password',
+                            help='Password of the user, for the token route')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', default='benchmark.json')
+
+    def _image(self):
+        """
+        Return a small in memory JPEG upload
+        """
+        image_file = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 80, 40)).save(image_file, 'JPEG')
+        image_file.name = 'bench.jpg'
+        image_file.seek(0)
+
+        return image_file
+
+    def _new_recipe(self):
+        """
+        Return a throwaway recipe of the user
+        """
+        return Recipe.objects.create(
+            user=self.user,
+            title='Benchmark recipe',
+            time_minutes=10,
+            price='5.00'
+        )
+
+    def _scenarios(self, options):
+        """
+        Return the benchmarked requests as (method, route, build) tuples
+
+        build returns the path and the keyword arguments of the request,
+        it runs before the timer starts.
+        """
+        user = self.user
+        recipe = Recipe.objects.filter(user=user).order_by('-id').first() \
+            or self._new_recipe()
+        tags = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)[:2]
+        )
+        ingredients = list(
+            Ingredient.objects.filter(user=user)
+            .values_list('id', flat=True)[:3]
+        )
+        tag = Tag.objects.filter(user=user).first() or \
+            Tag.objects.create(user=user, name='Benchmark tag')
+        filters = {'tags': ','.join(str(pk) for pk in tags)} if tags else {}
+        recipe_ids = list(
+            Recipe.objects.filter(user=user).order_by('-id')
+            .values_list('id', flat=True)[:100]
+        )
+
+        def detail(name, pk=None):
+            return reverse(f'recipe:{name}', args=[pk or recipe.id])
+
+        return [
+            ('GET', 'user:me', lambda i: (reverse('user:me'), {})),
+            ('PATCH', 'user:me', lambda i: (
+                reverse('user:me'), {'data': {'name': f'Bench {i}'}}
+            )),
+            ('POST', 'user:create', lambda i: (reverse('user:create'), {
+                'data': {
+                    'email': f'bench-{uuid.uuid4().hex}@example.com',
+                    'password': 'benchpass',
+                    'name': 'Bench',
+                }
+            })),
+            ('POST', 'user:token', lambda i: (reverse('user:token'), {
+                'data': {'email': user.email, 'password': options['password']}
+            })),
+            ('GET', 'recipe:api-root',
+             lambda i: (reverse('recipe:api-root'), {})),
+            ('GET', 'recipe:tag-list',
+             lambda i: (reverse('recipe:tag-list'), {})),
+            ('GET', 'recipe:tag-list?assigned_only=1', lambda i: (
+                reverse('recipe:tag-list'), {'data': {'assigned_only': 1}}
+            )),
+            ('POST', 'recipe:tag-list', lambda i: (
+                reverse('recipe:tag-list'), {'data': {'name': f'Bench {i}'}}
+            )),
+            ('GET', 'recipe:ingredient-list',
+             lambda i: (reverse('recipe:ingredient-list'), {})),
+            ('POST', 'recipe:ingredient-list', lambda i: (
+                reverse('recipe:ingredient-list'),
+                {'data': {'name': f'Bench {i}'}}
+            )),
+            ('GET', 'recipe:recipe-list',
+             lambda i: (reverse('recipe:recipe-list'), {})),
+            ('GET', 'recipe:recipe-list?tags', lambda i: (
+                reverse('recipe:recipe-list'), {'data': filters}
+            )),
+            ('GET', 'recipe:recipe-list?q', lambda i: (
+                reverse('recipe:recipe-list'), {'data': {'q': 'curry'}}
+            )),
+            ('POST', 'recipe:recipe-list', lambda i: (
+                reverse('recipe:recipe-list'), {'data': {
+                    'title': f'Bench {i}',
+                    'time_minutes': 10,
+                    'price': '5.00',
+                    'tags': tags,
+                    'ingredients': ingredients,
+                }}
+            )),
+            ('GET', 'recipe:recipe-detail',
+             lambda i: (detail('recipe-detail'), {})),
+            ('PATCH', 'recipe:recipe-detail', lambda i: (
+                detail('recipe-detail'), {'data': {'time_minutes': 10 + i}}
+            )),
+            ('DELETE', 'recipe:recipe-detail', lambda i: (
+                detail('recipe-detail', self._new_recipe().id), {}
+            )),
+            ('POST', 'recipe:recipe-upload-image', lambda i: (
+                detail('recipe-upload-image', self._new_recipe().id),
+                {'data': {'image': self._image()}, 'format': 'multipart'}
+            )),
+            ('POST', 'recipe:recipe-bulk-create', lambda i: (
+                reverse('recipe:recipe-bulk-create'), {'data': [
+                    {
+                        'title': f'Bench {i}.{n}',
+                        'time_minutes': 10,
+                        'price': '5.00',
+                        'tags': tags,
+                        'ingredients': ingredients,
+                    }
+                    for n in range(10)
+                ]}
+            )),
+            ('POST', 'recipe:recipe-bulk-attach', lambda i: (
+                reverse('recipe:recipe-bulk-attach'),
+                {'data': {'tag': tag.id, 'recipes': recipe_ids}}
+            )),
+            ('POST', 'recipe:recipe-bulk-detach', lambda i: (
+                reverse('recipe:recipe-bulk-detach'),
+                {'data': {'tag': tag.id, 'recipes': recipe_ids}}
+            )),
+            ('GET', 'recipe:recipe-export',
+             lambda i: (reverse('recipe:recipe-export'), {})),
+        ]
+
+    def _request(self, client, method, path, kwargs):
+        """
+        Make the request and read the whole body, returning the status
+        """
+        kwargs.setdefault('format', 'json')
+        if method == 'GET':
+            kwargs.pop('format')
+        response = getattr(client, method.lower())(path, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+        return response.status_code
+
+    def _measure(self, client, method, build, options):
+        """
+        Return the statistics of repeated requests to one route
+        """
+        for i in range(options['warmup']):
+            self._request(client, method, *build(i))
+
+        latencies, queries, statuses = [], [], Counter()
+        for i in range(options['iterations']):
+            path, kwargs = build(i)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                status_code = self._request(client, method, path, kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+            statuses[status_code] += 1
+
+        path, kwargs = build(options['iterations'])
+        tracemalloc.start()
+        try:
+            self._request(client, method, path, kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        stats = {
+            f'p{p}_ms': round(percentile(latencies, p), 3)
+            for p in PERCENTILES
+        }
+        stats.update({
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'status': {str(code): n for code, n in sorted(statuses.items())},
+        })
+
+        return stats
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        users = get_user_model().objects.order_by('id')
+        email = options['email']
+        self.user = users.filter(email=email).first() if email \
+            else users.filter(recipe__isnull=False).first()
+        if self.user is None:
+            raise CommandError('No matching user found')
+
+        results = {}
+        # Uploads go to a scratch media root, as files are not rolled back
+        media_root = tempfile.mkdtemp()
+        overrides = override_settings(
+            ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['localhost'],
+            MEDIA_ROOT=media_root,
+            LOGIN_THROTTLE=dict(
+                settings.LOGIN_THROTTLE,
+                IP_BURST=0,
+                EMAIL_BURST=0
+            )
+        )
+        try:
+            with overrides, transaction.atomic():
+                token, _ = Token.objects.get_or_create(user=self.user)
+                client = APIClient(HTTP_HOST='localhost')
+                client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+                scenarios = self._scenarios(options)
+                for method, route, build in scenarios:
+                    label = f'{method} {route}'
+                    results[label] = self._measure(
+                        client,
+                        method,
+                        build,
+                        options
+                    )
+                    self.stdout.write(
+                        f'{label:<45} p50 {results[label]["p50_ms"]:9.2f} ms '
+                        f'p99 {results[label]["p99_ms"]:9.2f} ms '
+                        f'{results[label]["queries_mean"]:6.1f} queries'
+                    )
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        covered = {route.split('?')[0] for _, route, _ in scenarios}
+        uncovered = sorted(route_names() - covered)
+        for name in uncovered:
+            self.stderr.write(f'Route {name} is not benchmarked')
+
+        report = {
+            'meta': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'user': self.user.email,
+                'recipes': Recipe.objects.filter(user=self.user).count(),
+                'tags': Tag.objects.filter(user=self.user).count(),
+                'ingredients': Ingredient.objects.filter(
+                    user=self.user
+                ).count(),
+                'iterations': options['iterations'],
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                            time.gmtime()),
+            },
+            'routes': results,
+            'uncovered': uncovered,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(results)} routes to {options["output"]}'
+        ))
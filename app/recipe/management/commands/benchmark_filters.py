@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_by_related
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the join and subquery recipe filters
+    """
+    help = (
+        "Time filtering a user's recipes by tags and ingredients with the "
+        "legacy chained joins and with the EXISTS based filter engine"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User whose recipes are queried')
+        parser.add_argument('--tags', default='', help='Comma separated ids')
+        parser.add_argument(
+            '--ingredients',
+            default='',
+            help='Comma separated ids'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _ids(self, value):
+        """
+        Convert a comma separated string of ids into a list of integers
+        """
+        return [int(pk) for pk in value.split(',') if pk]
+
+    def _time(self, queryset, repeat):
+        """
+        Return the fastest run time in ms and the rows of the queryset
+        """
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = list(queryset.values_list('id', flat=True))
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, rows
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        users = get_user_model().objects.order_by('id')
+        email = options['email']
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No matching user found')
+
+        tags = self._ids(options['tags'])
+        ingredients = self._ids(options['ingredients'])
+        base = Recipe.objects.filter(user=user)
+
+        joined = base
+        if tags:
+            joined = joined.filter(tags__id__in=tags)
+        if ingredients:
+            joined = joined.filter(ingredients__id__in=ingredients)
+
+        variants = [('join', joined)]
+        for match in (MATCH_ANY, MATCH_ALL):
+            queryset = base
+            if tags:
+                queryset = filter_by_related(queryset, 'tags', tags, match)
+            if ingredients:
+                queryset = filter_by_related(
+                    queryset, 'ingredients', ingredients, match
+                )
+            variants.append((f'exists match={match}', queryset))
+
+        self.stdout.write(
+            f'{base.count()} recipes for {user.email}, '
+            f'tags={tags} ingredients={ingredients}'
+        )
+        for label, queryset in variants:
+            elapsed, rows = self._time(queryset, options['repeat'])
+            self.stdout.write(
+                f'{label:<20} {elapsed:10.2f} ms {len(rows):8} rows '
+                f'{len(set(rows)):8} distinct'
+            )
@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from recipe.serializers import RecipeSerializer, RecipeValuesSerializer
+
+
+class Command(BaseCommand):
+    """
+    Command to compare the model and values based recipe list paths
+    """
+    help = (
+        "Time serializing and rendering a page of a user's recipes with "
+        "RecipeSerializer and JSONRenderer and with the values based "
+        "serializer and the fast JSON renderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='User whose recipes are listed')
+        parser.add_argument('--limit', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def _model_path(self, queryset):
+        """
+        Return the recipes rendered through the DRF serializer
+        """
+        queryset = queryset.prefetch_related('tags', 'ingredients')
+        data = RecipeSerializer(queryset, many=True).data
+
+        return JSONRenderer().render(data)
+
+    def _values_path(self, queryset):
+        """
+        Return the recipes rendered through the values based serializer
+        """
+        serializer = RecipeValuesSerializer()
+        data = serializer.to_representation(
+            list(queryset.values(*serializer.columns))
+        )
+
+        return FastJSONRenderer().render(data)
+
+    def _time(self, func, queryset, repeat):
+        """
+        Return the fastest run time in ms and the output of func
+        """
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = func(queryset)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, content
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        users = get_user_model().objects.order_by('id')
+        email = options['email']
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No matching user found')
+
+        queryset = Recipe.objects.filter(user=user) \
+            .order_by('-id')[:options['limit']]
+        count = len(queryset.values_list('id', flat=True))
+        self.stdout.write(f'{count} recipes for {user.email}')
+
+        results = [
+            ('model', self._time(self._model_path, queryset,
+                                 options['repeat'])),
+            ('values', self._time(self._values_path, queryset,
+                                  options['repeat'])),
+        ]
+        for label, (elapsed, content) in results:
+            rate = count / elapsed * 1000 if elapsed else 0
+            self.stdout.write(
+                f'{label:<10} {elapsed:10.2f} ms {rate:12.0f} recipes/s '
+                f'{len(content):10} bytes'
+            )
+
+        if results[0][1][1] != results[1][1][1]:
+            raise CommandError('Rendered output differs between paths')
+        self.stdout.write('Rendered output is identical')
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import views
+
+
+class Command(BaseCommand):
+    """
+    Command to print the query plans of the recipe API endpoints
+    """
+    help = 'Print EXPLAIN output for the queries run by the recipe API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='Explain the queries as this user (default: first user)'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run EXPLAIN ANALYZE (PostgreSQL only)'
+        )
+
+    def _get_user(self, email):
+        """
+        Return the user the queries are planned for
+        """
+        users = get_user_model().objects.order_by('id')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('No matching user found')
+
+        return user
+
+    def _view_queryset(self, viewset, action, user, params=None):
+        """
+        Return the queryset a viewset builds for the given request params
+        """
+        request = Request(APIRequestFactory().get('/', params or {}))
+        request.user = user
+        view = viewset(action=action, request=request, kwargs={})
+
+        return view.get_queryset()
+
+    def _queries(self, user):
+        """
+        Return the labelled querysets run by the recipe endpoints
+        """
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True)[:2]
+        ) or [0]
+        ingredient_ids = list(
+            Ingredient.objects.filter(user=user)
+            .values_list('id', flat=True)[:2]
+        ) or [0]
+        recipe_ids = Recipe.objects.filter(user=user).values('id')
+
+        def ids(values):
+            return ','.join(str(i) for i in values)
+
+        return [
+            ('tag list', self._view_queryset(
+                views.TagViewSet, 'list', user)),
+            ('tag list assigned only', self._view_queryset(
+                views.TagViewSet, 'list', user, {'assigned_only': 1})),
+            ('ingredient list', self._view_queryset(
+                views.IngredientViewSet, 'list', user)),
+            ('ingredient list assigned only', self._view_queryset(
+                views.IngredientViewSet, 'list', user, {'assigned_only': 1})),
+            ('recipe list', self._view_queryset(
+                views.RecipeViewSet, 'list', user)),
+            ('recipe list filtered by tags', self._view_queryset(
+                views.RecipeViewSet, 'list', user, {'tags': ids(tag_ids)})),
+            ('recipe list filtered by ingredients', self._view_queryset(
+                views.RecipeViewSet, 'list', user,
+                {'ingredients': ids(ingredient_ids)})),
+            ('recipe tags prefetch',
+             Tag.objects.filter(recipe__in=recipe_ids)),
+            ('recipe ingredients prefetch',
+             Ingredient.objects.filter(recipe__in=recipe_ids)),
+        ]
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        user = self._get_user(options['email'])
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        for label, queryset in self._queries(user):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
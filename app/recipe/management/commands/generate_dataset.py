@@ -0,0 +1,231 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.cache import bump_generation
+from recipe.usage import USAGE_MODELS, recompute_usage_counts
+
+ADJECTIVES = (
+    'Spicy', 'Smoky', 'Creamy', 'Crispy', 'Roasted', 'Grilled', 'Sweet',
+    'Tangy', 'Quick', 'Slow cooked', 'Baked', 'Fresh', 'Hearty', 'Vegan',
+)
+DISHES = (
+    'chicken curry', 'lentil soup', 'beef stew', 'fish tacos', 'pad thai',
+    'pancakes', 'risotto', 'lasagne', 'salad', 'burrito', 'ramen', 'pie',
+    'omelette', 'dumplings', 'chili', 'flatbread', 'noodles', 'tart',
+)
+RECIPE_DISTRIBUTIONS = ('fixed', 'uniform', 'exponential')
+
+
+class Command(BaseCommand):
+    """
+    Command to fill the database with a synthetic dataset
+    """
+    help = (
+        'Create users with tags, ingredients and recipes using bulk inserts, '
+        'to reproduce production sized data locally'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=50,
+            help='Mean number of recipes per user'
+        )
+        parser.add_argument(
+            '--recipe-distribution',
+            choices=RECIPE_DISTRIBUTIONS,
+            default='exponential',
+            help='How the number of recipes varies between users'
+        )
+        parser.add_argument('--tags', type=int, default=20,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int, default=40,
+                            help='Ingredients per user')
+        parser.add_argument('--tags-per-recipe', type=int, default=3,
+                            help='Most tags of a recipe')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6,
+                            help='Most ingredients of a recipe')
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Zipf exponent of tag and ingredient popularity, 0 for none'
+        )
+        parser.add_argument('--prefix', default='user',
+                            help='Prefix of the generated emails')
+        parser.add_argument('--start', type=int, default=0,
+                            help='Number of the first generated user')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Users inserted per transaction')
+        parser.add_argument('--seed', type=int)
+
+    def _recipe_count(self, options):
+        """
+        Draw the number of recipes of a user
+        """
+        mean = options['recipes']
+        distribution = options['recipe_distribution']
+        if distribution == 'uniform':
+            return self.random.randint(0, 2 * mean)
+        if distribution == 'exponential' and mean:
+            return int(self.random.expovariate(1 / mean))
+
+        return mean
+
+    def _pick(self, ids, weights, most):
+        """
+        Draw up to `most` distinct ids favouring the popular ones
+        """
+        if not ids or most <= 0:
+            return []
+        picks = self.random.choices(
+            ids,
+            weights=weights[:len(ids)],
+            k=self.random.randint(0, most)
+        )
+
+        return list(dict.fromkeys(picks))
+
+    def _recipe(self, user_id):
+        """
+        Return an unsaved recipe of the user with random attributes
+        """
+        title = f'{self.random.choice(ADJECTIVES)} ' \
+            f'{self.random.choice(DISHES)}'
+        link = ''
+        if self.random.random() < 0.3:
+            link = f'https://example.com/{title.lower().replace(" ", "-")}'
+
+        return Recipe(
+            user_id=user_id,
+            title=title,
+            time_minutes=self.random.randint(5, 180),
+            price=Decimal(self.random.randint(100, 9999)) / 100,
+            link=link
+        )
+
+    def _named(self, model, user_ids, count, label):
+        """
+        Insert `count` objects of the model per user and return their ids
+        """
+        model.objects.bulk_create(
+            model(user_id=user_id, name=f'{label} {i}')
+            for user_id in user_ids for i in range(count)
+        )
+        ids = {user_id: [] for user_id in user_ids}
+        rows = model.objects.filter(user_id__in=user_ids) \
+            .order_by('id').values_list('user_id', 'id')
+        for user_id, pk in rows:
+            ids[user_id].append(pk)
+
+        return ids
+
+    def _generate_batch(self, emails, options, password, weights):
+        """
+        Insert a batch of users with their objects and return the counts
+        """
+        User = get_user_model()
+        User.objects.bulk_create(
+            User(email=email, name=email.split('@')[0], password=password)
+            for email in emails
+        )
+        user_ids = list(
+            User.objects.filter(email__in=emails)
+            .order_by('id').values_list('id', flat=True)
+        )
+        tags = self._named(Tag, user_ids, options['tags'], 'Tag')
+        ingredients = self._named(
+            Ingredient,
+            user_ids,
+            options['ingredients'],
+            'Ingredient'
+        )
+
+        recipes = [
+            self._recipe(user_id)
+            for user_id in user_ids
+            for _ in range(self._recipe_count(options))
+        ]
+        if connection.features.can_return_ids_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+
+        links = 0
+        for field, related, most in (
+                ('tags', tags, options['tags_per_recipe']),
+                ('ingredients', ingredients,
+                 options['ingredients_per_recipe'])):
+            through = getattr(Recipe, field).through
+            column = f'{USAGE_MODELS[field]._meta.model_name}_id'
+            rows = [
+                through(recipe_id=recipe.id, **{column: pk})
+                for recipe in recipes
+                for pk in self._pick(related[recipe.user_id], weights, most)
+            ]
+            through.objects.bulk_create(rows)
+            links += len(rows)
+
+        # Bulk inserts bypass the signals keeping these in step
+        for field, model in USAGE_MODELS.items():
+            recompute_usage_counts(
+                field,
+                model.objects.filter(user_id__in=user_ids)
+            )
+        for user_id in user_ids:
+            bump_generation(user_id)
+
+        return len(user_ids), len(recipes), links
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        self.random = random.Random(options['seed'])
+        start = options['start']
+        emails = [
+            f'{options["prefix"]}{n}@example.com'
+            for n in range(start, start + options['users'])
+        ]
+        existing = get_user_model().objects.filter(email__in=emails)
+        if existing.exists():
+            raise CommandError(
+                f'{existing.count()} of the users already exist, '
+                'use another --prefix or --start'
+            )
+
+        password = make_password(options['password'])
+        most = max(options['tags'], options['ingredients'])
+        weights = [1 / (rank + 1) ** options['skew'] for rank in range(most)]
+        batch_size = max(options['batch_size'], 1)
+        totals = [0, 0, 0]
+        began = time.perf_counter()
+        for i in range(0, len(emails), batch_size):
+            with transaction.atomic():
+                counts = self._generate_batch(
+                    emails[i:i + batch_size],
+                    options,
+                    password,
+                    weights
+                )
+            totals = [total + count for total, count in zip(totals, counts)]
+            self.stdout.write(f'{totals[0]}/{len(emails)} users')
+
+        users, recipes, links = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {users} users, {users * options["tags"]} tags, '
+            f'{users * options["ingredients"]} ingredients, {recipes} '
+            f'recipes and {links} links in '
+            f'{time.perf_counter() - began:.1f} s'
+        ))
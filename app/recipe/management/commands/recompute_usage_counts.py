@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipe.usage import USAGE_MODELS, recompute_usage_counts
+
+
+class Command(BaseCommand):
+    """
+    Command to repair the usage counts of tags and ingredients
+    """
+    help = 'Recount how many recipes use each tag and ingredient'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='Only recount the objects of this user'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        for field, model in USAGE_MODELS.items():
+            queryset = model.objects.all()
+            if options['email']:
+                queryset = queryset.filter(user__email=options['email'])
+            updated = recompute_usage_counts(field, queryset)
+            self.stdout.write(f'Recounted {updated} {field}')
+
+        self.stdout.write(self.style.SUCCESS('Usage counts are up to date'))
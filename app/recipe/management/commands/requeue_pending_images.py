@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """
+    Command to process recipe images left pending by a lost job
+    """
+    help = 'Process the recipe images pending for longer than a while'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=10,
+            help='Minutes an image has been pending for (default 10)'
+        )
+
+    def handle(self, *args, **options):
+        """
+        Handle the Command
+        """
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        recipes = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PENDING,
+            updated_at__lt=cutoff
+        ).exclude(image='').exclude(image=None).values_list('id', 'image')
+
+        failed = 0
+        for recipe_id, image_name in recipes.iterator():
+            try:
+                process_recipe_image(recipe_id, image_name)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Recipe {recipe_id}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed pending images, {failed} failed'
+        ))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Keyset pagination for recipes using an opaque cursor on the id
+    """
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Page search results by their rank before the default ordering
+        """
+        if 'rank' in queryset.query.annotations:
+            return ('-rank',) + super().get_ordering(request, queryset, view)
+
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """
+    Keyset pagination for tags and ingredients ordered by name or usage
+    """
+    ordering = ('-name', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Page in the ordering the view was asked for
+        """
+        return view.get_ordering()
@@ -0,0 +1,91 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.cache import bump_generation
+from recipe.filters import RELATION_COLUMNS
+from recipe.usage import USAGE_MODELS, adjust_usage
+
+
+def _recipe_ids_sql(recipes):
+    """
+    Return the SQL and params selecting the ids of the recipes
+    """
+    return recipes.order_by().values('id').query.sql_with_params()
+
+
+def _finish(field, related, count):
+    """
+    Account for links added (positive) or removed (negative) in bulk
+
+    Through table queries bypass m2m_changed, so the usage count and the
+    cached lists are kept in step here.
+    """
+    if count:
+        adjust_usage(USAGE_MODELS[field], {related.pk: count})
+        bump_generation(related.user_id)
+
+
+def attach_related(recipes, field, related):
+    """
+    Add the tag or ingredient to every recipe of the queryset lacking it
+
+    The links are inserted with one INSERT ... SELECT on the through
+    table. Links a concurrent attach inserted first are skipped rather
+    than failing on the unique constraint. Returns the number of recipes
+    that gained the relation.
+    """
+    through = getattr(Recipe, field).through
+    table = connection.ops.quote_name(through._meta.db_table)
+    column = connection.ops.quote_name(RELATION_COLUMNS[field])
+    ids_sql, ids_params = _recipe_ids_sql(recipes)
+    insert = connection.ops.insert_statement(ignore_conflicts=True)
+    on_conflict = connection.ops.ignore_conflicts_suffix_sql(
+        ignore_conflicts=True
+    )
+
+    with transaction.atomic():
+        Recipe.objects.filter(pk__in=recipes.order_by().values('id')) \
+            .exclude(**{field: related}) \
+            .update(updated_at=timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{insert} {table} (recipe_id, {column}) '
+                f'SELECT r.id, %s FROM ({ids_sql}) r '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} l '
+                f'WHERE l.recipe_id = r.id AND l.{column} = %s) '
+                f'{on_conflict}',
+                (related.pk, *ids_params, related.pk)
+            )
+            count = cursor.rowcount
+        _finish(field, related, count)
+
+    return count
+
+
+def detach_related(recipes, field, related):
+    """
+    Remove the tag or ingredient from every recipe of the queryset
+
+    The links are deleted with one DELETE on the through table. Returns
+    the number of recipes that lost the relation.
+    """
+    through = getattr(Recipe, field).through
+    table = connection.ops.quote_name(through._meta.db_table)
+    column = connection.ops.quote_name(RELATION_COLUMNS[field])
+    ids_sql, ids_params = _recipe_ids_sql(recipes)
+
+    with transaction.atomic():
+        Recipe.objects.filter(pk__in=recipes.order_by().values('id')) \
+            .filter(**{field: related}) \
+            .update(updated_at=timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} = %s '
+                f'AND recipe_id IN ({ids_sql})',
+                (related.pk, *ids_params)
+            )
+            count = cursor.rowcount
+        _finish(field, related, -count)
+
+    return count
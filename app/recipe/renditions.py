@@ -0,0 +1,223 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image, features
+from django.conf import settings
+
+from recipe.images import normalize_orientation
+
+# Output formats mapped to their Pillow encoder and file extension, WebP
+# only when Pillow was built with it
+FORMATS = {'jpeg': ('JPEG', 'jpg')}
+if features.check('webp'):
+    FORMATS['webp'] = ('WEBP', 'webp')
+
+LOCK_STRIPES = 256
+_thread_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_evict_lock = threading.Lock()
+
+
+def rendition_root():
+    """
+    Return the directory holding the renditions
+    """
+    return os.path.join(settings.MEDIA_ROOT, settings.IMAGE_RENDITIONS['DIR'])
+
+
+def rendition_name(name, width, image_format, quality):
+    """
+    Return the media name of a rendition of the stored image `name`
+    """
+    key = hashlib.sha256(name.encode()).hexdigest()
+    size = f'w{width}' if width else 'full'
+
+    return os.path.join(
+        settings.IMAGE_RENDITIONS['DIR'],
+        key[:2],
+        key[2:4],
+        f'{key}-{size}-q{quality}.{FORMATS[image_format][1]}'
+    )
+
+
+@contextmanager
+def single_flight(name):
+    """
+    Hold the lock of the rendition against other threads and processes
+
+    Renditions share a fixed set of locks by hash, which saves creating
+    and cleaning up a lock file per rendition.
+    """
+    stripe = int(hashlib.sha256(name.encode()).hexdigest()[:8], 16) \
+        % LOCK_STRIPES
+    lock_dir = os.path.join(rendition_root(), 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, f'{stripe:02x}.lock')
+    with _thread_locks[stripe], open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _touch(path):
+    """
+    Mark the rendition as used for the eviction, returning if it exists
+
+    Only the access time changes, the modification time is what clients
+    revalidate against.
+    """
+    try:
+        stat = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except FileNotFoundError:
+        return False
+
+    return True
+
+
+def render(source, path, width, image_format, quality):
+    """
+    Write the image resized to `width` and encoded in the format to path
+
+    Images are never enlarged. The file is written next to its final
+    path and moved there, so it is either complete or missing.
+    """
+    pil_format = FORMATS[image_format][0]
+    with Image.open(source) as image:
+        image = normalize_orientation(image)
+        if width and image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS)
+        if pil_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            has_alpha = pil_format != 'JPEG' and (
+                'A' in image.mode or 'transparency' in image.info
+            )
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                image.save(tmp_file, format=pil_format, quality=quality)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _size_path():
+    """
+    Return the file holding the running size total of the renditions
+    """
+    return os.path.join(rendition_root(), 'locks', 'size')
+
+
+def _update_total(added=0, total=None):
+    """
+    Add to or replace the running size total shared by every process
+
+    Returns the new total, or None when it is unknown.
+    """
+    with open(_size_path(), 'a+') as size_file:
+        fcntl.flock(size_file, fcntl.LOCK_EX)
+        size_file.seek(0)
+        text = size_file.read().strip()
+        if total is None and text:
+            total = int(text) + added
+        if total is not None:
+            size_file.seek(0)
+            size_file.truncate()
+            size_file.write(str(total))
+
+    return total
+
+
+def record_rendition(size):
+    """
+    Count a new rendition in the total, evicting once over MAX_BYTES
+    """
+    total = _update_total(added=size)
+    if total is None or total > settings.IMAGE_RENDITIONS['MAX_BYTES']:
+        evict()
+
+
+def evict():
+    """
+    Remove the least recently used renditions beyond MAX_BYTES
+
+    Files are removed least recently accessed first until the cache is
+    back under LOW_WATER of its limit, leaving room for more renditions
+    before the next scan, which also corrects the running total. Skipped
+    while another thread or process is at it.
+    """
+    config = settings.IMAGE_RENDITIONS
+    root = rendition_root()
+    lock_dir = os.path.join(root, 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    if not _evict_lock.acquire(blocking=False):
+        return
+    try:
+        with open(os.path.join(lock_dir, 'evict.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+
+            files, total = [], 0
+            for directory, dirnames, filenames in os.walk(root):
+                if directory == root and 'locks' in dirnames:
+                    dirnames.remove('locks')
+                for filename in filenames:
+                    if filename.endswith('.tmp'):
+                        continue
+                    path = os.path.join(directory, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total > config['MAX_BYTES']:
+                target = config['MAX_BYTES'] * config['LOW_WATER']
+                for _, size, path in sorted(files):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            _update_total(total=total)
+    finally:
+        _evict_lock.release()
+
+
+def get_rendition(storage, name, width, image_format, quality):
+    """
+    Return the media name of a rendition of the image, rendering it once
+
+    Concurrent requests for a missing rendition wait for the one
+    rendering it instead of each resizing the image.
+    """
+    rendition = rendition_name(name, width, image_format, quality)
+    path = os.path.join(settings.MEDIA_ROOT, rendition)
+    if _touch(path):
+        return rendition
+
+    with single_flight(rendition):
+        if _touch(path):
+            return rendition
+        with storage.open(name, 'rb') as source:
+            render(source, path, width, image_format, quality)
+    record_rendition(os.path.getsize(path))
+
+    return rendition
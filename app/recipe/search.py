@@ -0,0 +1,27 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+# Must match the configuration used by the search_vector trigger
+SEARCH_CONFIG = 'english'
+
+
+def search_recipes(queryset, text):
+    """
+    Filter recipes by a full text search over their title
+
+    PostgreSQL matches against the indexed search_vector column and
+    annotates a rank, other databases fall back to matching every word
+    of the text case insensitively.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        # Ranks are cast to double precision so cursor positions round trip
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(rank=rank)
+
+    for word in text.split():
+        queryset = queryset.filter(title__icontains=word)
+
+    return queryset
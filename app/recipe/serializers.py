@@ -1,39 +1,169 @@
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 from core.models import Tag, Ingredient, Recipe
+from recipe.cache import bump_generation
+from recipe.renditions import FORMATS
+from recipe.usage import adjust_usage
+
+
+class UserUniqueNameSerializerMixin(serializers.Serializer):
+    """
+    Serializer mixin rejecting names the requesting user already uses
+    """
+
+    def validate_name(self, value):
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            name=value
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'You already have a {self.Meta.model._meta.verbose_name} '
+                'with this name.'
+            )
+
+        return value
 
 
-class TagSerializer(serializers.ModelSerializer):
+class RecipeCountSerializerMixin(serializers.Serializer):
+    """
+    Serializer mixin adding the recipe_count when set in the context
+    """
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get('recipe_count'):
+            self.fields.pop('recipe_count')
+
+
+class TagSerializer(UserUniqueNameSerializerMixin, RecipeCountSerializerMixin,
+                    serializers.ModelSerializer):
     """
     Serializer to hold the Tag objects
     """
 
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UserUniqueNameSerializerMixin,
+                           RecipeCountSerializerMixin,
+                           serializers.ModelSerializer):
     """
     Serializer to hold and map the data of ingredients
     """
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ManyIdOrNameRelatedField(serializers.ManyRelatedField):
+    """
+    Field resolving a list of ids and names of the user's objects at once
+
+    Existing objects are fetched with a single query. Names that match
+    none are returned as unsaved objects for the serializer to create.
+    Strings of digits are taken as ids, as form data sends ids that way.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        items = []
+        for item in data:
+            if isinstance(item, str):
+                item = item.strip()
+                if item.isdigit():
+                    item = int(item)
+            if isinstance(item, bool) or not isinstance(item, (int, str)) \
+                    or item == '':
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            if isinstance(item, str) and len(item) > child.max_name_length:
+                raise serializers.ValidationError(
+                    f'Ensure names have no more than '
+                    f'{child.max_name_length} characters.'
+                )
+            items.append(item)
+
+        model = child.get_queryset().model
+        user = self.context['request'].user
+        ids = [item for item in items if isinstance(item, int)]
+        names = [item for item in items if isinstance(item, str)]
+        found = model.objects.filter(user=user) \
+            .filter(Q(id__in=ids) | Q(name__in=names)) if items else []
+        by_id = {obj.id: obj for obj in found}
+        by_name = {obj.name: obj for obj in by_id.values()}
+
+        objects = {}
+        for item in items:
+            if isinstance(item, int):
+                if item not in by_id:
+                    child.fail('does_not_exist', pk_value=item)
+                objects.setdefault(('id', item), by_id[item])
+            elif item in by_name:
+                objects.setdefault(('id', by_name[item].id), by_name[item])
+            else:
+                objects.setdefault(('name', item), model(user=user, name=item))
+
+        return list(objects.values())
+
+
+class IdOrNameRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Related field taking the id or the name of an object of the user
+    """
+    max_name_length = 255
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return ManyIdOrNameRelatedField(**list_kwargs)
+
+
+class SparseFieldsSerializerMixin(serializers.Serializer):
+    """
+    Serializer mixin keeping only the fields listed in context['fields']
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """
     Serializer to hold and map recipe objects
     """
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = IdOrNameRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = IdOrNameRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -45,6 +175,136 @@ class RecipeSerializer(serializers.ModelSerializer):
             'link',)
         read_only_fields = ('id',)
 
+    def _create_named(self, validated_data):
+        """
+        Create the tags and ingredients given by new names in bulk
+
+        Conflicting inserts of a concurrent writer are ignored and the
+        objects are selected again, so both writers use the same rows.
+        """
+        for field in ('tags', 'ingredients'):
+            objects = validated_data.get(field) or []
+            new = [obj for obj in objects if obj.pk is None]
+            if not new:
+                continue
+            model, user_id = type(new[0]), new[0].user_id
+            model.objects.bulk_create(new, ignore_conflicts=True)
+            saved = {
+                obj.name: obj for obj in model.objects.filter(
+                    user_id=user_id,
+                    name__in=[obj.name for obj in new]
+                )
+            }
+            validated_data[field] = [
+                obj if obj.pk is not None else saved[obj.name]
+                for obj in objects
+            ]
+            # Bulk inserts bypass the signals invalidating cached lists
+            bump_generation(user_id)
+
+    def create(self, validated_data):
+        """
+        Create a recipe, creating the tags and ingredients named in it
+        """
+        with transaction.atomic():
+            self._create_named(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Update a recipe, creating the tags and ingredients named in it
+        """
+        with transaction.atomic():
+            self._create_named(validated_data)
+            return super().update(instance, validated_data)
+
+
+def related_ids(recipe_ids, relations=None, expand=()):
+    """
+    Return the ingredient and tag ids of the recipes keyed by recipe id
+
+    relations limits the (field, column) pairs that are fetched. Fields
+    in expand get the id and name of each object instead of the id, as
+    the nested serializers of RecipeDetailSerializer render them.
+    """
+    if relations is None:
+        relations = RecipeValuesSerializer.relations
+    ids_by_field = {}
+    for field, column in relations:
+        ids = defaultdict(list)
+        values = ('recipe_id', column)
+        if field in expand:
+            values += (f'{column[:-3]}__name',)
+        rows = getattr(Recipe, field).through.objects \
+            .filter(recipe_id__in=recipe_ids) \
+            .order_by('id') \
+            .values_list(*values)
+        for recipe_id, related_id, *name in rows:
+            if field in expand:
+                related_id = OrderedDict(
+                    (('id', related_id), ('name', name[0]))
+                )
+            ids[recipe_id].append(related_id)
+        ids_by_field[field] = ids
+
+    return ids_by_field
+
+
+class RecipeValuesSerializer:
+    """
+    Read only serializer building RecipeSerializer output from values()
+
+    Rows carry the columns below and the relation ids are fetched for a
+    whole page at once, so no per field dispatch or model instances are
+    involved. The output is identical to RecipeSerializer's, limited to
+    the given fields like SparseFieldsSerializerMixin does. Relations in
+    expand are nested like in RecipeDetailSerializer.
+    """
+    columns = ('id', 'title', 'time_minutes', 'price', 'link')
+    relations = (('ingredients', 'ingredient_id'), ('tags', 'tag_id'))
+    fields = RecipeSerializer.Meta.fields
+
+    def __init__(self, fields=None, expand=()):
+        self.expand = expand
+        if fields is not None:
+            self.fields = tuple(
+                field for field in self.fields if field in fields
+            )
+            # The id is needed to attach relations and paginate
+            self.columns = tuple(
+                column for column in self.columns
+                if column == 'id' or column in self.fields
+            )
+            self.relations = tuple(
+                relation for relation in self.relations
+                if relation[0] in self.fields
+            )
+        self.price = RecipeSerializer().fields['price']
+
+    def to_representation(self, rows):
+        """
+        Return the API representation of a list of recipe rows
+        """
+        relations = {}
+        if self.relations:
+            relations = related_ids(
+                [row['id'] for row in rows],
+                self.relations,
+                self.expand
+            )
+        to_price = self.price.to_representation
+        data = []
+        for row in rows:
+            if 'price' in row:
+                row['price'] = to_price(row['price'])
+            for field, _ in self.relations:
+                row[field] = relations[field].get(row['id'], [])
+            data.append(OrderedDict(
+                (field, row[field]) for field in self.fields
+            ))
+
+        return data
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """
@@ -53,13 +313,218 @@ class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
 
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'image', 'image_status', 'thumbnail',)
+        read_only_fields = ('id', 'image', 'image_status', 'thumbnail',)
+
+
+class RecipeBulkListSerializer(serializers.ListSerializer):
+    """
+    Serializer to validate and create many recipes in batches
+    """
+    relations = (('tags', Tag), ('ingredients', Ingredient))
+
+    def to_internal_value(self, data):
+        """
+        Validate every recipe and return the errors of all of them at once
+        """
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Expected a list of recipes.']}
+            )
+        max_length = settings.API_MAX_BULK_SIZE
+        if len(data) > max_length:
+            raise serializers.ValidationError({'non_field_errors': [
+                f'Ensure this list has no more than {max_length} items.'
+            ]})
+
+        values, errors = [], []
+        for item in data:
+            try:
+                values.append(self.child.run_validation(item))
+                errors.append({})
+            except serializers.ValidationError as exc:
+                values.append(None)
+                errors.append(exc.detail)
+
+        user = self.context['request'].user
+        for field, model in self.relations:
+            ids = {
+                pk for value in values if value for pk in value[field]
+            }
+            known = set(
+                model.objects.filter(user=user, id__in=ids)
+                .values_list('id', flat=True)
+            )
+            for value, error in zip(values, errors):
+                missing = [pk for pk in value[field] if pk not in known] \
+                    if value else []
+                if missing:
+                    error[field] = [
+                        f'Invalid pk "{pk}" - object does not exist.'
+                        for pk in missing
+                    ]
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return values
+
+    def create(self, validated_data):
+        """
+        Insert the recipes and their relations with batched queries
+        """
+        relations = [
+            {field: item.pop(field) for field, _ in self.relations}
+            for item in validated_data
+        ]
+        recipes = [Recipe(**item) for item in validated_data]
+
+        with transaction.atomic():
+            if connection.features.can_return_ids_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save()
+
+            for field, model in self.relations:
+                through = getattr(Recipe, field).through
+                column = f'{model._meta.model_name}_id'
+                links = [
+                    through(recipe_id=recipe.id, **{column: pk})
+                    for recipe, related in zip(recipes, relations)
+                    for pk in dict.fromkeys(related[field])
+                ]
+                through.objects.bulk_create(links)
+                adjust_usage(
+                    model,
+                    Counter(getattr(link, column) for link in links)
+                )
+
+            # Bulk inserts bypass m2m_changed so invalidate explicitly
+            for user_id in {recipe.user_id for recipe in recipes}:
+                bump_generation(user_id)
+
+        return recipes
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """
+    Serializer to validate a recipe of a bulk create without lookups
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list
+    )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'title', 'ingredients', 'tags', 'time_minutes', 'price',
+            'link',)
+        read_only_fields = ('id',)
+        list_serializer_class = RecipeBulkListSerializer
+
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """
     Serializer to hold and map images for recipies
     """
+    # Decoding and verification of the image happen in the image workers
+    image = serializers.FileField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id',)
+        fields = ('id', 'image', 'image_status', 'thumbnail')
+        read_only_fields = ('id', 'image_status', 'thumbnail')
+
+    def update(self, instance, validated_data):
+        """
+        Store the new image and mark it as waiting for processing
+        """
+        previous = instance.image.name
+        instance.thumbnail.delete(save=False)
+        validated_data['image_status'] = Recipe.IMAGE_PENDING
+        instance = super().update(instance, validated_data)
+        # Release the reference of the replaced image, even when the new
+        # upload has the same content and took its own
+        if previous:
+            instance.image.storage.delete(previous)
+
+        return instance
+
+
+class RecipeRenditionSerializer(serializers.Serializer):
+    """
+    Serializer to validate the rendition asked for of a recipe image
+    """
+    width = serializers.ChoiceField(
+        choices=settings.IMAGE_RENDITIONS['WIDTHS'],
+        required=False
+    )
+    format = serializers.ChoiceField(choices=tuple(FORMATS), default='jpeg')
+    quality = serializers.ChoiceField(
+        choices=settings.IMAGE_RENDITIONS['QUALITIES'],
+        default=settings.IMAGE_RENDITIONS['DEFAULT_QUALITY']
+    )
+
+
+class RecipeRelationBulkSerializer(serializers.Serializer):
+    """
+    Serializer to validate attaching or detaching a tag or ingredient
+
+    The recipes are chosen by id or with a filter taking the recipe list
+    query parameters.
+    """
+    relations = (
+        ('tag', 'tags', Tag),
+        ('ingredient', 'ingredients', Ingredient),
+    )
+
+    tag = serializers.IntegerField(required=False)
+    ingredient = serializers.IntegerField(required=False)
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        max_length=settings.API_MAX_BULK_SIZE
+    )
+    filter = serializers.DictField(
+        child=serializers.CharField(allow_blank=True),
+        required=False
+    )
+
+    def validate(self, attrs):
+        """
+        Check one related object of the user and one recipe selection
+        """
+        given = [
+            (name, field, model)
+            for name, field, model in self.relations if name in attrs
+        ]
+        if len(given) != 1:
+            raise serializers.ValidationError(
+                'Provide exactly one of tag or ingredient.'
+            )
+        if ('recipes' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                'Provide exactly one of recipes or filter.'
+            )
+
+        name, field, model = given[0]
+        user = self.context['request'].user
+        related = model.objects.filter(user=user, pk=attrs[name]).first()
+        if related is None:
+            raise serializers.ValidationError({name: [
+                f'Invalid pk "{attrs[name]}" - object does not exist.'
+            ]})
+        attrs['field'] = field
+        attrs['related'] = related
+
+        return attrs
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.cache import bump_generation
+from recipe.filters import RELATION_COLUMNS
+from recipe.usage import USAGE_MODELS, adjust_usage
+
+RELATION_FIELDS = {
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+def invalidate_owner(sender, instance, **kwargs):
+    """
+    Invalidate the cached lists of the owner of a tag, ingredient or recipe
+    """
+    bump_generation(instance.user_id)
+
+
+def invalidate_recipe_relations(sender, instance, action, **kwargs):
+    """
+    Invalidate the cached lists when recipe tags or ingredients change
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_generation(instance.user_id)
+
+
+def touch_related_recipes(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Bump the modification time of recipes whose tags or ingredients change
+    """
+    now = timezone.now()
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.objects.filter(pk=instance.pk).update(updated_at=now)
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.filter(pk__in=pk_set).update(updated_at=now)
+    elif action == 'pre_clear':
+        Recipe.objects.filter(**{RELATION_FIELDS[sender]: instance}) \
+            .update(updated_at=now)
+
+
+def touch_recipes_of_deleted(sender, instance, **kwargs):
+    """
+    Bump the modification time of recipes losing a deleted tag/ingredient
+    """
+    field = 'tags' if sender is Tag else 'ingredients'
+    Recipe.objects.filter(**{field: instance}) \
+        .update(updated_at=timezone.now())
+
+
+def record_recipe_deletion(sender, instance, **kwargs):
+    """
+    Remember when the user last deleted a recipe for conditional requests
+    """
+    get_user_model().objects.filter(pk=instance.user_id) \
+        .update(recipes_deleted_at=timezone.now())
+
+
+def count_usage(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the usage counts in step with added and removed recipe relations
+
+    Removals are counted before they happen, from the rows that actually
+    exist, as Django reports every requested id in pk_set.
+    """
+    field = RELATION_FIELDS[sender]
+    model = USAGE_MODELS[field]
+    column = RELATION_COLUMNS[field]
+    if not reverse:
+        if action == 'post_add':
+            adjust_usage(model, dict.fromkeys(pk_set, 1))
+        elif action in ('pre_remove', 'pre_clear'):
+            links = sender.objects.filter(recipe_id=instance.pk)
+            if action == 'pre_remove':
+                links = links.filter(**{f'{column}__in': pk_set})
+            ids = links.values_list(column, flat=True)
+            adjust_usage(model, dict.fromkeys(ids, -1))
+        return
+
+    if action == 'post_add':
+        adjust_usage(model, {instance.pk: len(pk_set)})
+    elif action in ('pre_remove', 'pre_clear'):
+        links = sender.objects.filter(**{column: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(recipe_id__in=pk_set)
+        adjust_usage(model, {instance.pk: -links.count()})
+
+
+def release_usage(sender, instance, **kwargs):
+    """
+    Decrement the usage of the tags and ingredients of a deleted recipe
+    """
+    for field, model in USAGE_MODELS.items():
+        column = RELATION_COLUMNS[field]
+        ids = getattr(Recipe, field).through.objects \
+            .filter(recipe_id=instance.pk) \
+            .values_list(column, flat=True)
+        adjust_usage(model, dict.fromkeys(ids, -1))
+
+
+def release_image_files(sender, instance, **kwargs):
+    """
+    Release the image and thumbnail files of a deleted recipe
+    """
+    for field_file in (instance.image, instance.thumbnail):
+        if field_file:
+            field_file.storage.delete(field_file.name)
+
+
+def invalidate_new_user(sender, instance, created, **kwargs):
+    """
+    Start a new user with a fresh generation in case their id is reused
+    """
+    if created:
+        bump_generation(instance.pk)
+
+
+def connect():
+    """
+    Connect the response cache, modification time, usage and file
+    receivers
+    """
+    for model in (Tag, Ingredient):
+        post_save.connect(invalidate_owner, sender=model)
+        post_delete.connect(invalidate_owner, sender=model)
+        pre_delete.connect(touch_recipes_of_deleted, sender=model)
+    post_delete.connect(invalidate_owner, sender=Recipe)
+    post_delete.connect(record_recipe_deletion, sender=Recipe)
+    pre_delete.connect(release_usage, sender=Recipe)
+    post_delete.connect(release_image_files, sender=Recipe)
+    for through in RELATION_FIELDS:
+        m2m_changed.connect(invalidate_recipe_relations, sender=through)
+        m2m_changed.connect(touch_related_recipes, sender=through)
+        m2m_changed.connect(count_usage, sender=through)
+    post_save.connect(invalidate_new_user, sender=get_user_model())
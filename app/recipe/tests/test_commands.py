@@ -0,0 +1,296 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """
+    Test the command printing the recipe API query plans
+    """
+
+    def test_explain_queries(self):
+        """
+        Test a plan is printed for each endpoint query
+        """
+        user = get_user_model().objects.create_user(
+            'arslan.ashraf@admin.com',
+            'admin1234'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Egg toast',
+            time_minutes=10,
+            price=5.00
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name='Breakfast'))
+        out = StringIO()
+
+        call_command('explain_queries', email=user.email, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('tag list assigned only', output)
+        self.assertIn('recipe list filtered by tags', output)
+        self.assertIn('core_recipe_tags', output)
+
+    def test_explain_queries_without_user(self):
+        """
+        Test the command fails when there is no user to plan for
+        """
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+class BenchmarkFiltersCommandTests(TestCase):
+    """
+    Test the command comparing the recipe filter implementations
+    """
+
+    def test_benchmark_filters(self):
+        """
+        Test the join variant reports duplicates the others do not
+        """
+        user = get_user_model().objects.create_user(
+            'arslan.ashraf@admin.com',
+            'admin1234'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Egg toast',
+            time_minutes=10,
+            price=5.00
+        )
+        tag1 = Tag.objects.create(user=user, name='Breakfast')
+        tag2 = Tag.objects.create(user=user, name='Quick')
+        recipe.tags.add(tag1, tag2)
+        out = StringIO()
+
+        call_command(
+            'benchmark_filters',
+            tags=f'{tag1.id},{tag2.id}',
+            repeat=1,
+            stdout=out
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertRegex(lines[1], r'^join .* 2 rows +1 distinct$')
+        self.assertRegex(lines[2], r'^exists match=any .* 1 rows +1 distinct$')
+        self.assertRegex(lines[3], r'^exists match=all .* 1 rows +1 distinct$')
+
+
+class BenchmarkSerializersCommandTests(TestCase):
+    """
+    Test the command comparing the recipe list serialization paths
+    """
+
+    def test_benchmark_serializers(self):
+        """
+        Test both paths are timed and render identical output
+        """
+        user = get_user_model().objects.create_user(
+            'arslan.ashraf@admin.com',
+            'admin1234'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Egg toast',
+            time_minutes=10,
+            price=5.00
+        )
+        recipe.tags.add(Tag.objects.create(user=user, name='Breakfast'))
+        out = StringIO()
+
+        call_command('benchmark_serializers', repeat=1, stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], f'1 recipes for {user.email}')
+        self.assertRegex(lines[1], r'^model .* ms .* recipes/s .* bytes$')
+        self.assertRegex(lines[2], r'^values .* ms .* recipes/s .* bytes$')
+        self.assertEqual(lines[3], 'Rendered output is identical')
+
+
+class RecomputeUsageCountsCommandTests(TestCase):
+    """
+    Test the command repairing tag and ingredient usage counts
+    """
+
+    def test_recompute_usage_counts(self):
+        """
+        Test drifted usage counts are recounted from the recipes
+        """
+        user = get_user_model().objects.create_user(
+            'arslan.ashraf@admin.com',
+            'admin1234'
+        )
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Egg toast',
+            time_minutes=10,
+            price=5.00
+        )
+        tag = Tag.objects.create(user=user, name='Breakfast')
+        ingredient = Ingredient.objects.create(user=user, name='Egg')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        Tag.objects.update(usage_count=7)
+        Ingredient.objects.update(usage_count=0)
+
+        call_command('recompute_usage_counts', stdout=StringIO())
+
+        tag.refresh_from_db()
+        ingredient.refresh_from_db()
+        self.assertEqual(tag.usage_count, 1)
+        self.assertEqual(ingredient.usage_count, 1)
+
+
+class GenerateDatasetCommandTests(TestCase):
+    """
+    Test the command generating a synthetic dataset
+    """
+
+    def test_generate_dataset(self):
+        """
+        Test users are created with their objects and usage counts
+        """
+        call_command(
+            'generate_dataset',
+            users=3,
+            recipes=4,
+            recipe_distribution='fixed',
+            tags=5,
+            ingredients=6,
+            batch_size=2,
+            seed=1,
+            stdout=StringIO()
+        )
+
+        users = get_user_model().objects.filter(email__endswith='@example.com')
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(users[0].check_password('password'))
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Ingredient.objects.count(), 18)
+        self.assertEqual(Recipe.objects.count(), 12)
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.usage_count, tag.recipe_set.count())
+            self.assertFalse(tag.recipe_set.exclude(user=tag.user).exists())
+
+    def test_generate_dataset_existing_users(self):
+        """
+        Test generating users that already exist fails
+        """
+        call_command('generate_dataset', users=1, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', users=1, stdout=StringIO())
+
+
+class BenchmarkApiCommandTests(TestCase):
+    """
+    Test the command load testing the API routes
+    """
+
+    def test_benchmark_api(self):
+        """
+        Test every route is reported and the changes are rolled back
+        """
+        call_command(
+            'generate_dataset',
+            users=1,
+            recipes=3,
+            recipe_distribution='fixed',
+            stdout=StringIO()
+        )
+        counts = (Recipe.objects.count(), Tag.objects.count())
+
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(MEDIA_ROOT=directory):
+            # An image stored before files were reference counted
+            image = os.path.join(directory, 'uploads', 'recipe', 'old.jpg')
+            os.makedirs(os.path.dirname(image))
+            with open(image, 'wb') as image_file:
+                image_file.write(b'image')
+            Recipe.objects.filter(
+                id=Recipe.objects.order_by('-id')[0].id
+            ).update(image='uploads/recipe/old.jpg')
+
+            output = os.path.join(directory, 'benchmark.json')
+            call_command(
+                'benchmark_api',
+                iterations=2,
+                warmup=0,
+                output=output,
+                stdout=StringIO()
+            )
+            with open(output) as report_file:
+                report = json.load(report_file)
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                ['benchmark.json', 'uploads']
+            )
+            self.assertEqual(
+                os.listdir(os.path.dirname(image)),
+                ['old.jpg']
+            )
+
+        self.assertEqual(report['uncovered'], [])
+        self.assertEqual(report['meta']['recipes'], 3)
+        self.assertIn('GET recipe:recipe-list', report['routes'])
+        for label, stats in report['routes'].items():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertEqual(
+                [code for code in stats['status'] if code >= '400'],
+                [],
+                label
+            )
+        self.assertEqual(
+            (Recipe.objects.count(), Tag.objects.count()),
+            counts
+        )
+
+
+class RequeuePendingImagesCommandTests(TestCase):
+    """
+    Test the command processing images left pending
+    """
+
+    def test_requeue_pending_images(self):
+        """
+        Test only images pending for long enough are processed
+        """
+        user = get_user_model().objects.create_user(
+            'arslan.ashraf@admin.com',
+            'admin1234'
+        )
+        recipes = [
+            Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=10,
+                price=5.00,
+                image=f'uploads/recipe/{i}.jpg',
+                image_status=Recipe.IMAGE_PENDING
+            )
+            for i in range(2)
+        ]
+        Recipe.objects.filter(id=recipes[0].id).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        with patch('recipe.management.commands.requeue_pending_images.'
+                   'process_recipe_image') as process:
+            call_command('requeue_pending_images', stdout=StringIO())
+
+        process.assert_called_once_with(
+            recipes[0].id,
+            'uploads/recipe/0.jpg'
+        )
@@ -51,7 +51,7 @@ class PrivateIngredientsApiTests(TestCase):
 
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_retrieve_ingredients_authenticated_user(self):
@@ -69,8 +69,8 @@ class PrivateIngredientsApiTests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredient.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)
 
     def test_create_ingredient_successful(self):
         """
@@ -121,5 +121,53 @@ class PrivateIngredientsApiTests(TestCase):
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_ingredients_cache_invalidated_on_recipe_change(self):
+        """
+        Test the cached ingredient list follows recipe ingredient changes
+        """
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = Recipe.objects.create(
+            title='Fries',
+            time_minutes=20,
+            price=3.00,
+            user=self.user
+        )
+        self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        with self.assertNumQueries(0):
+            self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        recipe.ingredients.add(ingredient)
+        res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(
+            res.data['results'],
+            [IngredientSerializer(ingredient).data]
+        )
+
+    def test_retrieve_assigned_ingredients_with_recipe_count(self):
+        """
+        Test assigned ingredients are returned once with their recipe count
+        """
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Sugar')
+        for title in ('Fries', 'Soup'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=20,
+                price=3.00,
+                user=self.user
+            )
+            recipe.ingredients.add(ingredient)
+
+        res = self.client.get(
+            INGREDIENTS_URL,
+            {'assigned_only': 1, 'recipe_count': 1}
+        )
+
+        self.assertEqual(res.data['results'], [
+            {'id': ingredient.id, 'name': 'Salt', 'recipe_count': 2},
+        ])
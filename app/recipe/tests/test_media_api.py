@@ -0,0 +1,388 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, content_storage
+from recipe import renditions
+
+CONTENT = b'0123456789'
+
+
+def media_url(name):
+    """
+    Return the url serving a media file
+    """
+    return reverse('media', args=[name])
+
+
+class RecipeMediaTests(TestCase):
+    """
+    Test serving recipe images
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, media_root)
+
+        self.user = get_user_model().objects.create_user(
+            'user@admin.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Toast',
+            time_minutes=5,
+            price=5.00
+        )
+        self.recipe.image.save('photo.jpg', ContentFile(CONTENT))
+        self.recipe.thumbnail.save('thumbnail.jpg', ContentFile(b'thumb'))
+        self.url = media_url(self.recipe.image.name)
+
+    def content(self, res):
+        return b''.join(res.streaming_content)
+
+    def test_login_required(self):
+        """
+        Test media files are not served anonymously
+        """
+        res = APIClient().get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_user_image_not_found(self):
+        """
+        Test images of recipes of other users are not served
+        """
+        other = get_user_model().objects.create_user('other@admin.com', 'pw')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_serve_image(self):
+        """
+        Test the image is served with long lived caching headers
+        """
+        res = self.client.get(self.url, HTTP_ACCEPT='image/webp')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.content(res), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('Last-Modified', res)
+
+        res = self.client.get(media_url(self.recipe.thumbnail.name))
+        self.assertEqual(self.content(res), b'thumb')
+
+    def test_serve_range(self):
+        """
+        Test byte ranges are answered with partial content
+        """
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(self.content(res), b'2345')
+        self.assertEqual(res['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(res['Content-Length'], '4')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(self.content(res), b'789')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=8-')
+        self.assertEqual(self.content(res), b'89')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=0-1,4-5')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_if_range_changed(self):
+        """
+        Test the whole file is sent when If-Range does not match
+        """
+        res = self.client.get(
+            self.url,
+            HTTP_RANGE='bytes=2-5',
+            HTTP_IF_RANGE=http_date(0)
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.content(res), CONTENT)
+
+    def test_not_modified(self):
+        """
+        Test a cached copy is revalidated without sending the file
+        """
+        res = self.client.get(self.url)
+
+        res = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_x_accel_redirect(self):
+        """
+        Test the transfer is handed to nginx when configured
+        """
+        serving = dict(settings.MEDIA_SERVING, SENDFILE='x-accel-redirect')
+        with override_settings(MEDIA_SERVING=serving):
+            res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/{self.recipe.image.name}'
+        )
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_x_sendfile(self):
+        """
+        Test the transfer is handed to Apache or lighttpd when configured
+        """
+        serving = dict(settings.MEDIA_SERVING, SENDFILE='x-sendfile')
+        with override_settings(MEDIA_SERVING=serving):
+            res = self.client.get(self.url)
+
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(settings.MEDIA_ROOT, self.recipe.image.name)
+        )
+
+
+class RecipeRenditionTests(TestCase):
+    """
+    Test serving resized variants of recipe images
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, media_root)
+
+        self.user = get_user_model().objects.create_user(
+            'user@admin.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Toast',
+            time_minutes=5,
+            price=5.00,
+            image_status=Recipe.IMAGE_READY
+        )
+        image_file = io.BytesIO()
+        Image.new('RGB', (200, 100), (200, 80, 40)).save(image_file, 'PNG')
+        self.recipe.image.save('photo.png', ContentFile(image_file.getvalue()))
+        self.url = media_url(self.recipe.image.name)
+
+    def get_image(self, res):
+        return Image.open(io.BytesIO(b''.join(res.streaming_content)))
+
+    def test_rendition_resized_once(self):
+        """
+        Test a rendition is rendered on the first request and then reused
+        """
+        with patch('recipe.renditions.render',
+                   wraps=renditions.render) as render:
+            res1 = self.client.get(self.url, {'width': 128})
+            res2 = self.client.get(self.url, {'width': 128})
+
+        self.assertEqual(res1.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res1['Cache-Control'])
+        image = self.get_image(res1)
+        self.assertEqual((image.format, image.size), ('JPEG', (128, 64)))
+        self.assertEqual(self.get_image(res2).size, (128, 64))
+        self.assertEqual(render.call_count, 1)
+
+    def test_rendition_not_enlarged(self):
+        """
+        Test images narrower than the width keep their size
+        """
+        res = self.client.get(self.url, {'width': 1024, 'quality': 90})
+
+        self.assertEqual(self.get_image(res).size, (200, 100))
+
+    @skipUnless('webp' in renditions.FORMATS, 'Pillow lacks WebP support')
+    def test_rendition_webp(self):
+        """
+        Test renditions can be encoded as WebP
+        """
+        res = self.client.get(self.url, {'width': 128, 'format': 'webp'})
+
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertEqual(self.get_image(res).format, 'WEBP')
+
+    def test_rendition_invalid(self):
+        """
+        Test widths, formats and qualities outside the choices are refused
+        """
+        for params in ({'width': 100}, {'format': 'gif'}, {'quality': 1}):
+            res = self.client.get(self.url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rendition_of_unprocessed_image(self):
+        """
+        Test renditions are only made of images that passed processing
+        """
+        Recipe.objects.filter(id=self.recipe.id).update(
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+        res = self.client.get(self.url, {'width': 128})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_concurrent_requests_render_once(self):
+        """
+        Test concurrent requests for a missing rendition resize once
+        """
+        def slow_render(*args):
+            time.sleep(0.05)
+            render(*args)
+
+        render = renditions.render
+        names = []
+        with patch('recipe.renditions.render',
+                   side_effect=slow_render) as mock_render:
+            threads = [
+                threading.Thread(target=lambda: names.append(
+                    renditions.get_rendition(
+                        content_storage,
+                        self.recipe.image.name,
+                        128,
+                        'jpeg',
+                        75
+                    )
+                ))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(mock_render.call_count, 1)
+        self.assertEqual(len(set(names)), 1)
+        self.assertTrue(content_storage.exists(names[0]))
+
+    def test_least_recently_used_evicted(self):
+        """
+        Test the least recently used renditions go beyond the size limit
+        """
+        names = [
+            renditions.get_rendition(
+                content_storage,
+                self.recipe.image.name,
+                width,
+                'jpeg',
+                75
+            )
+            for width in (128, 512, 1024)
+        ]
+        paths = [content_storage.path(name) for name in names]
+        now = time.time()
+        # Last accessed long ago but most recently modified first
+        for age, path in zip((300, 100, 200), paths):
+            os.utime(path, (now - age, now - 400 + age))
+        sizes = [os.path.getsize(path) for path in paths]
+        config = dict(
+            settings.IMAGE_RENDITIONS,
+            MAX_BYTES=sum(sizes) - 1,
+            LOW_WATER=1
+        )
+
+        with override_settings(IMAGE_RENDITIONS=config):
+            renditions.evict()
+
+        self.assertEqual(
+            [os.path.exists(path) for path in paths],
+            [False, True, True]
+        )
+
+    def test_rendition_not_modified(self):
+        """
+        Test serving a rendition leaves its Last-Modified unchanged
+        """
+        res = self.client.get(self.url, {'width': 128})
+        path = content_storage.path(renditions.rendition_name(
+            self.recipe.image.name, 128, 'jpeg', 75
+        ))
+        now = time.time()
+        os.utime(path, (now - 100, now - 100))
+
+        res = self.client.get(self.url, {'width': 128})
+        last_modified = res['Last-Modified']
+        res = self.client.get(
+            self.url,
+            {'width': 128},
+            HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(last_modified, http_date(now - 100))
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertGreater(os.stat(path).st_atime, now - 1)
+
+    def test_cache_scanned_only_over_limit(self):
+        """
+        Test new renditions are counted without scanning the cache
+        """
+        with patch('recipe.renditions.os.walk', wraps=os.walk) as walk:
+            for width in (128, 512):
+                renditions.get_rendition(
+                    content_storage,
+                    self.recipe.image.name,
+                    width,
+                    'jpeg',
+                    75
+                )
+            # The first rendition finds no running total yet
+            self.assertEqual(walk.call_count, 1)
+
+            config = dict(settings.IMAGE_RENDITIONS, MAX_BYTES=1)
+            with override_settings(IMAGE_RENDITIONS=config):
+                renditions.get_rendition(
+                    content_storage,
+                    self.recipe.image.name,
+                    1024,
+                    'jpeg',
+                    75
+                )
+
+        self.assertEqual(walk.call_count, 2)
+        with open(renditions._size_path()) as size_file:
+            self.assertEqual(size_file.read(), '0')
@@ -1,18 +1,45 @@
+import csv
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import json
+from datetime import timedelta
 import tempfile
 import os
+from unittest.mock import Mock, patch
 
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from core.models import Recipe, Tag, Ingredient
+from core.models import Recipe, Tag, Ingredient, StoredFile
 
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe import workers
+from recipe.pagination import RecipeCursorPagination
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer, \
+                               RecipeBulkSerializer, TagSerializer, \
+                               IngredientSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
+EXPORT_URL = reverse('recipe:recipe-export')
+ATTACH_URL = reverse('recipe:recipe-bulk-attach')
+DETACH_URL = reverse('recipe:recipe-bulk-detach')
+
+# Minimal big endian EXIF block holding only the orientation tag set to 6
+EXIF_ROTATE_270 = (
+    b'Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x01'
+    b'\x01\x12\x00\x03\x00\x00\x00\x01\x00\x06\x00\x00'
+    b'\x00\x00\x00\x00'
+)
 
 
 def image_upload_url(recipe_id):
@@ -99,7 +126,31 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_recipes_renders_like_serializer(self):
+        """
+        Test the values based list renders the same bytes as the serializer
+        """
+        recipe = sample_recipe(
+            user=self.user,
+            title='Crème brûlée\u2028au café',
+            price=12.5
+        )
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_Ingredient(user=self.user))
+        sample_recipe(user=self.user, link='https://example.com/soup')
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='application/json')
+
+        recipes = Recipe.objects.all().order_by('-id')
+        expected = JSONRenderer().render({
+            'next': None,
+            'previous': None,
+            'results': RecipeSerializer(recipes, many=True).data,
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected)
 
     def test_recipies_limitedto_user(self):
         """
@@ -118,8 +169,252 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_recipes_query_count_is_constant(self):
+        """
+        Test listing recipes does not query tags and ingredients per recipe
+
+        One query computes the conditional request validators.
+        """
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_Ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_view_recipe_detail_query_count(self):
+        """
+        Test the recipe detail fetches nested objects in constant queries
+
+        One query computes the conditional request validators.
+        """
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+        recipe.ingredients.add(sample_Ingredient(user=self.user))
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_list_recipes_sparse_fields(self):
+        """
+        Test listing only the requested fields skips the relation queries
+        """
+        recipe = sample_recipe(user=self.user, title='Toast', price=2.5)
+        recipe.tags.add(sample_tag(user=self.user))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPES_URL, {'fields': 'price,id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': recipe.id, 'price': '2.50'}
+        ])
+
+        res = self.client.get(RECIPES_URL, {'fields': 'id,tags'})
+
+        self.assertEqual(res.data['results'], [
+            {'id': recipe.id, 'tags': [recipe.tags.get().id]}
+        ])
+
+    def test_retrieve_recipe_sparse_fields(self):
+        """
+        Test retrieving only the requested fields skips the prefetches
+        """
+        recipe = sample_recipe(user=self.user, title='Toast')
+        recipe.tags.add(sample_tag(user=self.user))
+        recipe.ingredients.add(sample_Ingredient(user=self.user))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'fields': 'id,title,image_status'}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            {'id': recipe.id, 'title': 'Toast', 'image_status': ''}
+        )
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id), {'fields': 'tags'})
+
+        self.assertEqual(res.data, {
+            'tags': TagSerializer(recipe.tags.all(), many=True).data
+        })
+
+    def test_list_recipes_expanded(self):
+        """
+        Test expanding nests tags and ingredients in constant queries
+        """
+        for i in range(5):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                sample_Ingredient(user=self.user, name=f'Ingredient {i}'),
+                sample_Ingredient(user=self.user, name=f'Other {i}')
+            )
+
+        with self.assertNumQueries(6):
+            res = self.client.get(
+                RECIPES_URL,
+                {'expand': 'tags,ingredients'}
+            )
+
+        recipes = Recipe.objects.order_by('-id')
+        expected = RecipeSerializer(recipes, many=True).data
+        for item, recipe in zip(expected, recipes):
+            links = Recipe.ingredients.through.objects \
+                .filter(recipe=recipe).order_by('id')
+            item['tags'] = TagSerializer(recipe.tags.all(), many=True).data
+            item['ingredients'] = IngredientSerializer(
+                [link.ingredient for link in links],
+                many=True
+            ).data
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], expected)
+
+    def test_list_recipes_expanded_one_relation(self):
+        """
+        Test only the requested relation is nested
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        ingredient = sample_Ingredient(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        result = res.data['results'][0]
+        self.assertEqual(result['tags'], [{'id': tag.id, 'name': tag.name}])
+        self.assertEqual(result['ingredients'], [ingredient.id])
+
+    def test_list_recipes_expanded_modified(self):
+        """
+        Test renaming a nested tag changes the expanded list's ETag only
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+        plain = self.client.get(RECIPES_URL)['ETag']
+        expanded = self.client.get(RECIPES_URL, {'expand': 'tags'})['ETag']
+
+        Tag.objects.filter(id=tag.id).update(
+            name='Renamed',
+            updated_at=timezone.now() + timedelta(seconds=1)
+        )
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'expand': 'tags'},
+            HTTP_IF_NONE_MATCH=expanded
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Renamed')
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_recipes_expanded_filtered(self):
+        """
+        Test expanding combines with the tag and ingredient filters
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        ingredient = sample_Ingredient(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        sample_recipe(user=self.user, title='Untagged')
+
+        for params in (
+            {'tags': tag.id},
+            {'tags': tag.id, 'match': 'all'},
+            {'ingredients': ingredient.id},
+        ):
+            res = self.client.get(
+                RECIPES_URL,
+                dict(params, expand='tags,ingredients')
+            )
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [item['id'] for item in res.data['results']],
+                [recipe.id]
+            )
+
+    def test_list_recipes_expand_unknown(self):
+        """
+        Test expanding anything but tags and ingredients is rejected
+        """
+        res = self.client.get(RECIPES_URL, {'expand': 'tags,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', res.data)
+
+    def test_sparse_fields_unknown(self):
+        """
+        Test asking for fields the representation lacks is rejected
+        """
+        recipe = sample_recipe(user=self.user)
+
+        res = self.client.get(RECIPES_URL, {'fields': 'id,image'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'user'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_recipes_paginated_by_cursor(self):
+        """
+        Test the recipe list is returned in pages linked by a cursor
+        """
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[4].id, recipes[3].id]
+        )
+        self.assertIsNone(res.data['previous'])
+
+        seen = []
+        url = RECIPES_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            seen.extend(r['id'] for r in res.data['results'])
+            url = res.data['next']
+
+        self.assertEqual(seen, [r.id for r in reversed(recipes)])
+
+    def test_list_recipes_page_size_is_bounded(self):
+        """
+        Test the requested page size cannot exceed the maximum
+        """
+        for i in range(4):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 3):
+            res = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 3)
 
     def test_view_recipe_detail(self):
         """
@@ -235,7 +530,558 @@ class PrivateRecipeApiTests(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags), 0)
 
+    def test_create_recipe_with_tag_names(self):
+        """
+        Test creating a recipe with new and existing tags and ingredients
+        """
+        vegan = sample_tag(user=self.user, name='Vegan')
+        lime = sample_Ingredient(user=self.user, name='Lime')
+        other = get_user_model().objects.create_user(
+            'other@admin.com',
+            'admin1234'
+        )
+        sample_tag(user=other, name='Dessert')
+        payload = {
+            'title': 'Avacado Lime Cheesecake',
+            'tags': ['Vegan', 'Dessert', ' Dessert ', vegan.id],
+            'ingredients': [lime.id, 'Avocado'],
+            'time_minutes': 60,
+            'price': '20.00',
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        dessert = Tag.objects.get(user=self.user, name='Dessert')
+        avocado = Ingredient.objects.get(user=self.user, name='Avocado')
+        self.assertEqual(res.data['tags'], [vegan.id, dessert.id])
+        self.assertEqual(res.data['ingredients'], [lime.id, avocado.id])
+        self.assertEqual(Tag.objects.filter(name='Dessert').count(), 2)
+        dessert.refresh_from_db()
+        self.assertEqual(dessert.usage_count, 1)
+
+    def test_update_recipe_with_tag_names_batched(self):
+        """
+        Test names are resolved with one lookup and one insert per model
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user, name='Vegan')
+        payload = {'tags': ['Vegan', 'Quick', 'Cheap', 'Spicy']}
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                detail_url(recipe.id),
+                payload,
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        inserts = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('INSERT') and 'INTO "core_tag" ' in q['sql']
+        ]
+        lookups = [
+            q['sql'] for q in queries
+            if q['sql'].startswith('SELECT') and 'FROM "core_tag"' in q['sql']
+            and '"core_tag"."name" IN' in q['sql']
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(recipe.tags.count(), 4)
+        self.assertIn(tag, recipe.tags.all())
+
+    def test_create_recipe_with_invalid_tags(self):
+        """
+        Test ids of other users and malformed names are rejected
+        """
+        other = get_user_model().objects.create_user(
+            'other@admin.com',
+            'admin1234'
+        )
+        other_tag = sample_tag(user=other)
+        payloads = [
+            [other_tag.id],
+            ['x' * 256],
+            [''],
+            [True],
+            [{'name': 'Vegan'}],
+        ]
+
+        for tags in payloads:
+            res = self.client.post(RECIPES_URL, {
+                'title': 'Toast',
+                'tags': tags,
+                'ingredients': [],
+                'time_minutes': 5,
+                'price': '1.00',
+            }, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('tags', res.data)
+
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_bulk_create_recipes(self):
+        """
+        Test creating many recipes with their relations in one request
+        """
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        ingredient = sample_Ingredient(user=self.user, name='Ginger')
+        payload = [
+            {
+                'title': 'Avacado Lime Cheesecake',
+                'time_minutes': 60,
+                'price': '20.00',
+                'tags': [tag1.id, tag2.id],
+            },
+            {
+                'title': 'Thai prawn red curry',
+                'time_minutes': 40,
+                'price': '30.00',
+                'tags': [tag1.id],
+                'ingredients': [ingredient.id],
+            },
+            {'title': 'Toast', 'time_minutes': 5, 'price': '1.00'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [r.title for r in recipes],
+            [item['title'] for item in payload]
+        )
+        self.assertEqual(set(recipes[0].tags.all()), {tag1, tag2})
+        tag1.refresh_from_db()
+        self.assertEqual(tag1.usage_count, 2)
+        self.assertEqual(list(recipes[1].ingredients.all()), [ingredient])
+        self.assertEqual(recipes[2].tags.count(), 0)
+        self.assertEqual(res.data[1]['ingredients'], [ingredient.id])
+
+    def test_bulk_create_validates_relations_in_one_query(self):
+        """
+        Test tag and ingredient ids are validated with a query per model
+        """
+        tags = [sample_tag(user=self.user, name=f'Tag {i}') for i in range(5)]
+        ingredient = sample_Ingredient(user=self.user)
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 5,
+                'price': '5.00',
+                'tags': [tag.id for tag in tags],
+                'ingredients': [ingredient.id],
+            }
+            for i in range(5)
+        ]
+        serializer = RecipeBulkSerializer(
+            data=payload,
+            many=True,
+            context={'request': Mock(user=self.user)}
+        )
+
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid())
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """
+        Test invalid recipes are reported by position and nothing is saved
+        """
+        user2 = get_user_model().objects.create_user(
+            'testuser@admin.com',
+            'admin1234'
+        )
+        foreign_tag = sample_tag(user=user2)
+        payload = [
+            {'title': 'Toast', 'time_minutes': 5, 'price': '1.00'},
+            {'title': 'Eggs', 'price': '1.00'},
+            {
+                'title': 'Curry',
+                'time_minutes': 5,
+                'price': '1.00',
+                'tags': [foreign_tag.id],
+            },
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertIn('tags', res.data[2])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_create_requires_list(self):
+        """
+        Test the bulk endpoint rejects a single recipe object
+        """
+        payload = {'title': 'Toast', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_attach_tag_by_ids(self):
+        """
+        Test attaching a tag to many recipes with one insert
+        """
+        tag = sample_tag(user=self.user)
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe3 = sample_recipe(user=self.user)
+        recipe1.tags.add(tag)
+        other = sample_recipe(user=get_user_model().objects.create_user(
+            'other@admin.com',
+            'admin1234'
+        ))
+        payload = {
+            'tag': tag.id,
+            'recipes': [recipe1.id, recipe2.id, other.id],
+        }
+
+        res = self.client.post(ATTACH_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 1})
+        self.assertEqual(
+            set(tag.recipe_set.values_list('id', flat=True)),
+            {recipe1.id, recipe2.id}
+        )
+        self.assertFalse(recipe3.tags.exists())
+        self.assertFalse(other.tags.exists())
+        tag.refresh_from_db()
+        self.assertEqual(tag.usage_count, 2)
+
+    def test_bulk_attach_ingredient_by_filter(self):
+        """
+        Test attaching an ingredient to the recipes matching a filter
+        """
+        ingredient = sample_Ingredient(user=self.user)
+        vegan = sample_tag(user=self.user, name='Vegan')
+        recipe1 = sample_recipe(user=self.user, title='Lentil curry')
+        recipe2 = sample_recipe(user=self.user, title='Bean curry')
+        recipe3 = sample_recipe(user=self.user, title='Pork curry')
+        recipe1.tags.add(vegan)
+        recipe2.tags.add(vegan)
+        payload = {
+            'ingredient': ingredient.id,
+            'filter': {'tags': str(vegan.id), 'q': 'curry'},
+        }
+
+        res = self.client.post(ATTACH_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'updated': 2})
+        self.assertEqual(
+            set(ingredient.recipe_set.values_list('id', flat=True)),
+            {recipe1.id, recipe2.id}
+        )
+        self.assertFalse(recipe3.ingredients.exists())
+
+    def test_bulk_detach_tag(self):
+        """
+        Test detaching a tag touches and counts only the affected recipes
+        """
+        tag = sample_tag(user=self.user)
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe1.tags.add(tag)
+        recipe2.tags.add(tag)
+        untouched = sample_recipe(user=self.user)
+        updated_at = untouched.updated_at
+        payload = {'tag': tag.id, 'recipes': [recipe1.id, untouched.id]}
+
+        res = self.client.post(DETACH_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'updated': 1})
+        self.assertEqual(list(tag.recipe_set.all()), [recipe2])
+        tag.refresh_from_db()
+        untouched.refresh_from_db()
+        self.assertEqual(tag.usage_count, 1)
+        self.assertEqual(untouched.updated_at, updated_at)
 
+    def test_bulk_attach_invalidates_list(self):
+        """
+        Test the recipe list is not answered 304 after a bulk change
+        """
+        tag = sample_tag(user=self.user)
+        recipe = sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        self.client.post(
+            ATTACH_URL,
+            {'tag': tag.id, 'recipes': [recipe.id]},
+            format='json'
+        )
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['tags'], [tag.id])
+
+    def test_bulk_attach_invalid(self):
+        """
+        Test bulk changes need one owned object and one recipe selection
+        """
+        tag = sample_tag(user=self.user)
+        ingredient = sample_Ingredient(user=self.user)
+        other_tag = sample_tag(user=get_user_model().objects.create_user(
+            'other@admin.com',
+            'admin1234'
+        ))
+        payloads = [
+            {'recipes': [1]},
+            {'tag': tag.id, 'ingredient': ingredient.id, 'recipes': [1]},
+            {'tag': tag.id},
+            {'tag': tag.id, 'recipes': [1], 'filter': {}},
+            {'tag': other_tag.id, 'recipes': [1]},
+            {'tag': tag.id, 'filter': {'match': 'some'}},
+        ]
+
+        for payload in payloads:
+            res = self.client.post(ATTACH_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_by_title(self):
+        """
+        Test searching recipes returns those matching every word
+        """
+        recipe1 = sample_recipe(user=self.user, title='Thai red curry')
+        recipe2 = sample_recipe(user=self.user, title='Green curry')
+        sample_recipe(user=self.user, title='Fish n Chips')
+
+        res = self.client.get(RECIPES_URL, {'q': 'curry'})
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [recipe2.id, recipe1.id])
+
+        res = self.client.get(RECIPES_URL, {'q': 'red CURRY'})
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_search_recipes_limited_to_user(self):
+        """
+        Test searching only returns recipes of the authenticated user
+        """
+        user2 = get_user_model().objects.create_user(
+            'testuser@admin.com',
+            'admin1234'
+        )
+        sample_recipe(user=user2, title='Green curry')
+
+        res = self.client.get(RECIPES_URL, {'q': 'curry'})
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_list_recipes_not_modified(self):
+        """
+        Test polling an unchanged recipe list returns 304 with one query
+        """
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_recipes_etag_stable_across_processes(self):
+        """
+        Test the list ETag does not depend on the process local cache
+        """
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user, title='Other')
+        recipe.delete()
+        res = self.client.get(RECIPES_URL)
+
+        cache.clear()
+        res2 = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res2['ETag'], res['ETag'])
+
+    def test_list_recipes_modified(self):
+        """
+        Test the list ETag changes when a recipe changes or is removed
+        """
+        recipe = sample_recipe(user=self.user)
+        sample_recipe(user=self.user, title='Other')
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        recipe.tags.add(sample_tag(user=self.user))
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        recipe.delete()
+        res2 = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res2.data['results']), 1)
+
+    def test_list_recipes_if_modified_since(self):
+        """
+        Test the list honours If-Modified-Since
+        """
+        sample_recipe(user=self.user)
+        res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(
+            RECIPES_URL,
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_recipe_detail_not_modified(self):
+        """
+        Test the detail ETag follows the recipe and its nested tags
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        recipe.tags.add(tag)
+        url = detail_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        tag.name = 'Renamed'
+        tag.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Renamed')
+
+    def test_recipe_relation_change_updates_timestamp(self):
+        """
+        Test changing tags from either side bumps the recipe updated_at
+        """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user)
+        old = timezone.now() - timedelta(days=1)
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=old)
+
+        tag.recipe_set.add(recipe)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, old)
+
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=old)
+        tag.delete()
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, old)
+
+    def test_filter_recipes_returns_each_once(self):
+        """
+        Test a recipe matching several filter ids is returned once
+        """
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        ingredient1 = sample_Ingredient(user=self.user, name='Salt')
+        ingredient2 = sample_Ingredient(user=self.user, name='Pepper')
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ingredient1, ingredient2)
+
+        res = self.client.get(RECIPES_URL, {
+            'tags': f'{tag1.id},{tag2.id}',
+            'ingredients': f'{ingredient1.id},{ingredient2.id}',
+        })
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipe.id]
+        )
+
+    def test_filter_recipes_match_all(self):
+        """
+        Test match=all only returns recipes having every given tag
+        """
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe1 = sample_recipe(user=self.user, title='Vegan cake')
+        recipe1.tags.add(tag1, tag2)
+        recipe2 = sample_recipe(user=self.user, title='Vegan curry')
+        recipe2.tags.add(tag1)
+        params = {'tags': f'{tag1.id},{tag2.id}'}
+
+        res = self.client.get(RECIPES_URL, dict(params, match='all'))
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipe1.id]
+        )
+
+        res = self.client.get(RECIPES_URL, dict(params, match='any'))
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipe2.id, recipe1.id]
+        )
+
+    def test_filter_recipes_invalid_params(self):
+        """
+        Test malformed filter parameters are rejected
+        """
+        res = self.client.get(RECIPES_URL, {'tags': '1', 'match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPES_URL, {'tags': 'a,b'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_recipes_ndjson(self):
+        """
+        Test exporting recipes streams one JSON document per line
+        """
+        for i in range(3):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+        recipe.ingredients.add(sample_Ingredient(user=self.user))
+        sample_recipe(
+            user=get_user_model().objects.create_user('o@admin.com', 'pass')
+        )
+
+        res = self.client.get(EXPORT_URL)
+        with self.assertNumQueries(5):
+            content = b''.join(res.streaming_content).decode()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        expected = json.loads(json.dumps(
+            RecipeSerializer(recipes, many=True).data
+        ))
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            expected
+        )
+
+    def test_export_recipes_csv(self):
+        """
+        Test exporting recipes as CSV with a header row
+        """
+        recipe = sample_recipe(user=self.user, title='Curry, hot')
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Dessert')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+        content = b''.join(res.streaming_content).decode()
+
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(rows[0], list(RecipeSerializer.Meta.fields))
+        self.assertEqual(rows[1][1], 'Curry, hot')
+        self.assertEqual(rows[1][3], f'{tag1.id},{tag2.id}')
+        self.assertEqual(rows[1][5], '5.00')
+
+    def test_export_recipes_invalid_type(self):
+        """
+        Test an unknown export type is rejected
+        """
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(IMAGE_PIPELINE=dict(settings.IMAGE_PIPELINE, EAGER=True))
 class RecipeImageUploadTests(TestCase):
     """
     Test the image uploads for the recipe
@@ -250,7 +1096,9 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
         self.recipe.image.delete()
+        self.recipe.thumbnail.delete()
 
     def test_upload_image_to_recipe(self):
         """
@@ -264,9 +1112,167 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(os.path.exists(self.recipe.thumbnail.path))
+
+    def test_upload_image_normalizes_orientation(self):
+        """
+        Test the thumbnail is rotated according to the EXIF orientation
+        """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (20, 10))
+            img.save(ntf, format='JPEG', exif=EXIF_ROTATE_270)
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.size, (10, 20))
+
+    def test_upload_corrupt_image_fails_processing(self):
+        """
+        Test an upload that is not an image is marked as failed
+        """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.image)
+
+    def upload_jpeg(self):
+        """
+        Upload a small JPEG to the recipe
+        """
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': ntf},
+                format='multipart'
+            )
+
+    def test_upload_decompression_bomb_fails_processing(self):
+        """
+        Test an image Pillow refuses to decode is marked as failed
+        """
+        with patch('recipe.images.Image.open',
+                   side_effect=Image.DecompressionBombError):
+            self.upload_jpeg()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_unexpected_error_fails_processing(self):
+        """
+        Test an unexpected processing error is logged and marks a failure
+        """
+        with patch('recipe.images.make_thumbnail',
+                   side_effect=RuntimeError('boom')), \
+                self.assertLogs('recipe.workers', 'ERROR') as logs:
+            res = self.upload_jpeg()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.thumbnail)
+        self.assertIn('boom', logs.output[0])
+
+    def test_worker_failure_logged(self):
+        """
+        Test exceptions raised in the worker processes are logged
+        """
+        future = Future()
+        future.set_exception(RuntimeError('boom'))
+
+        with self.assertLogs('recipe.workers', 'ERROR') as logs:
+            workers.log_failure(future)
+
+        self.assertIn('boom', logs.output[0])
+
+    def test_broken_pool_replaced(self):
+        """
+        Test a job is queued in a new pool when a worker died
+        """
+        broken, fresh = Mock(), Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        with patch('recipe.workers._executor', broken), \
+                patch('recipe.workers.ProcessPoolExecutor',
+                      return_value=fresh):
+            workers._submit(print, 'job')
+            self.assertIs(workers._executor, fresh)
+
+        broken.shutdown.assert_called_once_with(wait=False)
+        fresh.submit.assert_called_once_with(print, 'job')
+
+    @override_settings(IMAGE_PIPELINE=dict(settings.IMAGE_PIPELINE))
+    def test_upload_image_processed_after_response(self):
+        """
+        Test the upload returns before the image has been processed
+        """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            with patch('recipe.workers.get_executor') as get_executor:
+                res = self.client.post(
+                    url,
+                    {'image': ntf},
+                    format='multipart'
+                )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+        self.assertFalse(self.recipe.thumbnail)
+        get_executor.assert_not_called()
+
+    def test_upload_identical_image_shared(self):
+        """
+        Test identical uploads share one file and replacing releases it
+        """
+        recipe2 = sample_recipe(user=self.user, title='Other')
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            for recipe in (self.recipe, recipe2):
+                ntf.seek(0)
+                self.client.post(
+                    image_upload_url(recipe.id),
+                    {'image': ntf},
+                    format='multipart'
+                )
+
+        self.recipe.refresh_from_db()
+        recipe2.refresh_from_db()
+        name = self.recipe.image.name
+        self.assertEqual(name, recipe2.image.name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 2)
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10), (255, 0, 0)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(
+                image_upload_url(recipe2.id),
+                {'image': ntf},
+                format='multipart'
+            )
+
+        recipe2.refresh_from_db()
+        self.assertNotEqual(recipe2.image.name, name)
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        recipe2.image.delete()
+        recipe2.thumbnail.delete()
 
     def test_upload_image_bad_request(self):
         """
@@ -296,6 +1302,6 @@ class RecipeImageUploadTests(TestCase):
         serializer = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
@@ -53,7 +53,7 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """
@@ -70,8 +70,26 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+
+    def test_tags_paginated_by_name(self):
+        """
+        Test tags are paged by name
+        """
+        names = ['Vegan', 'Dessert', 'Vegetarian', 'Lunch', 'Breakfast']
+        tags = [Tag.objects.create(user=self.user, name=n) for n in names]
+
+        seen = []
+        url = TAGS_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            self.assertLessEqual(len(res.data['results']), 2)
+            seen.extend(t['id'] for t in res.data['results'])
+            url = res.data['next']
+
+        expected = sorted(tags, key=lambda t: t.name, reverse=True)
+        self.assertEqual(seen, [t.id for t in expected])
 
     def test_create_tag_successful(self):
         """
@@ -96,6 +114,23 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_tag_duplicate_name(self):
+        """
+        Test a user cannot create two tags with the same name
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user(
+            'other@admin.com',
+            'admin1234'
+        )
+        Tag.objects.create(user=other, name='Dessert')
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TAGS_URL, {'name': 'Dessert'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
     def test_retrieve_tags_assigned_to_recipes(self):
         """
         Test filtering tags assigned to recipes
@@ -114,5 +149,168 @@ class PrivateTagsApiTests(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """
+        Test filtering assigned tags returns each tag once
+        """
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_tags_with_recipe_count(self):
+        """
+        Test the recipe count of each tag is returned in the same query
+        """
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, {'recipe_count': 1})
+
+        self.assertEqual(res.data['results'], [
+            {'id': tag2.id, 'name': tag2.name, 'recipe_count': 0},
+            {'id': tag1.id, 'name': tag1.name, 'recipe_count': 2},
+        ])
+
+        res = self.client.get(TAGS_URL)
+        self.assertNotIn('recipe_count', res.data['results'][0])
+
+    def test_tags_list_served_from_cache(self):
+        """
+        Test repeated tag lists are answered without querying the database
+        """
+        Tag.objects.create(user=self.user, name='Vegan')
+        res1 = self.client.get(TAGS_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(TAGS_URL)
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(res1.data, res2.data)
+
+    def test_tags_cache_invalidated_on_create(self):
+        """
+        Test creating a tag invalidates the cached tag list
+        """
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Dinner'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], 'Dinner')
+
+    def test_assigned_tags_cache_invalidated_on_recipe_change(self):
+        """
+        Test changing recipe tags invalidates the assigned only list
+        """
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=10,
+            price=5.00,
+            user=self.user
+        )
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data['results'], [])
+
+        recipe.tags.add(tag)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data['results']), 1)
+
+        recipe.delete()
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(res.data['results'], [])
+
+    def test_tag_usage_count_follows_recipes(self):
+        """
+        Test the usage count of tags follows recipe tag changes
+        """
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        recipe1 = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+        recipe2 = Recipe.objects.create(
+            title='Omelette',
+            time_minutes=5,
+            price=3.00,
+            user=self.user
+        )
+
+        def counts():
+            tag1.refresh_from_db()
+            tag2.refresh_from_db()
+            return tag1.usage_count, tag2.usage_count
+
+        recipe1.tags.add(tag1, tag2)
+        recipe1.tags.add(tag1)
+        tag1.recipe_set.add(recipe2)
+        self.assertEqual(counts(), (2, 1))
+
+        recipe1.tags.remove(tag2, Tag.objects.create(user=self.user, name='X'))
+        self.assertEqual(counts(), (2, 0))
+
+        recipe1.tags.set([tag2])
+        self.assertEqual(counts(), (1, 1))
+
+        tag1.recipe_set.clear()
+        recipe1.delete()
+        self.assertEqual(counts(), (0, 0))
+
+    def test_tags_ordered_by_usage(self):
+        """
+        Test tags can be listed most used first
+        """
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        tag3 = Tag.objects.create(user=self.user, name='Dinner')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag1)
+        recipe.tags.add(tag3)
+
+        res = self.client.get(TAGS_URL, {'ordering': '-usage'})
+
+        self.assertEqual(
+            [t['id'] for t in res.data['results']],
+            [tag1.id, tag3.id, tag2.id]
+        )
+
+    def test_tags_invalid_ordering(self):
+        """
+        Test an unknown ordering is rejected
+        """
+        res = self.client.get(TAGS_URL, {'ordering': 'name'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
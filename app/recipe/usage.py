@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.filters import RELATION_COLUMNS
+
+USAGE_MODELS = {'tags': Tag, 'ingredients': Ingredient}
+
+
+def adjust_usage(model, deltas):
+    """
+    Atomically add the deltas, keyed by object id, to the usage counts
+
+    Objects sharing the same delta are updated with a single query.
+    """
+    ids_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            ids_by_delta[delta].append(pk)
+    for delta, ids in ids_by_delta.items():
+        model.objects.filter(pk__in=ids) \
+            .update(usage_count=F('usage_count') + delta)
+
+
+def recompute_usage_counts(field, queryset=None):
+    """
+    Recount the usage of tags or ingredients from the through table
+
+    Returns the number of objects updated.
+    """
+    model = USAGE_MODELS[field]
+    column = RELATION_COLUMNS[field]
+    counts = getattr(Recipe, field).through.objects \
+        .filter(**{column: OuterRef('pk')}) \
+        .order_by().values(column) \
+        .annotate(count=Count('recipe_id')).values('count')
+    if queryset is None:
+        queryset = model.objects.all()
+
+    return queryset.update(usage_count=Coalesce(
+        Subquery(counts, output_field=IntegerField()), 0
+    ))
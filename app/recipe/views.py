@@ -1,10 +1,26 @@
+from django.conf import settings
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, \
+                             Subquery
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from core.media import serve_file
 from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from recipe import conditional, serializers
+from recipe.export import EXPORT_FORMATS, iter_recipes
+from recipe.filters import RELATION_COLUMNS, filter_recipes
+from recipe.images import schedule_image_processing
+from recipe.relations import attach_related, detach_related
+from recipe.renditions import get_rendition
+from recipe.cache import list_response_key, response_cache
+from user.authentication import CachedTokenAuthentication
+from recipe.pagination import RecipeCursorPagination, \
+                              RecipeAttrCursorPagination
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 
 class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
@@ -13,20 +29,84 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
     """
     Base Viewset fot user owned recipies attributes
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+    # Name of the Recipe many to many field pointing at the model
+    recipe_field = None
+    # Values of the ordering parameter mapped to unique orderings
+    orderings = {
+        '-name': ('-name', 'id'),
+        '-usage': ('-usage_count', 'id'),
+    }
+
+    def get_ordering(self):
+        """
+        Return the ordering requested with the ordering parameter
+        """
+        ordering = self.request.query_params.get('ordering', '-name')
+        if ordering not in self.orderings:
+            raise ValidationError(
+                {'ordering': [f'Choose one of {", ".join(self.orderings)}.']}
+            )
+
+        return self.orderings[ordering]
+
+    def _include_recipe_count(self):
+        """
+        Return whether the recipe_count of each object was requested
+        """
+        return bool(self.request.query_params.get('recipe_count'))
 
     def get_queryset(self):
         """
         Return the objects for current authenticatec user
         """
         assigned_only = bool(self.request.query_params.get('assigned_only'))
+        through = getattr(Recipe, self.recipe_field).through
+        links = through.objects.filter(
+            **{RELATION_COLUMNS[self.recipe_field]: OuterRef('pk')}
+        )
 
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.annotate(assigned=Exists(links)) \
+                .filter(assigned=True)
+        if self._include_recipe_count():
+            counts = links.order_by() \
+                .values(RELATION_COLUMNS[self.recipe_field]) \
+                .annotate(count=Count('recipe_id')).values('count')
+            queryset = queryset.annotate(recipe_count=Coalesce(
+                Subquery(counts, output_field=IntegerField()), 0
+            ))
+
+        return queryset.filter(user=self.request.user) \
+            .order_by(*self.get_ordering())
+
+    def get_serializer_context(self):
+        """
+        Tell the serializer whether to include the recipe counts
+        """
+        context = super().get_serializer_context()
+        context['recipe_count'] = self._include_recipe_count()
 
-        return queryset.filter(user=self.request.user).order_by('-name')
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return the list from the cache while the user's data is unchanged
+        """
+        assigned_only = bool(request.query_params.get('assigned_only'))
+        key = list_response_key(request, self.basename, assigned_only)
+        cache = response_cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+
+        return response
 
     def perform_create(self, serializer):
         """
@@ -41,6 +121,7 @@ class TagViewSet(BaseRecipeAttrViewSet):
     """
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    recipe_field = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -49,6 +130,7 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    recipe_field = 'ingredients'
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -57,30 +139,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
     """
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeCursorPagination
+    relation_fields = ('tags', 'ingredients')
 
-    def _params_to_ids(self, cs):
+    def get_queryset(self):
         """
-        Convert a list of string IDs into a list of integer IDs
+        Return the recipies w.r.t the authenticated user
         """
-        return [int(str_id) for str_id in cs.split(',')]
+        queryset = filter_recipes(
+            self.queryset.defer('search_vector'),
+            self.request.query_params
+        )
+        if self.action == 'retrieve':
+            fields = self.get_requested_fields()
+            if fields is None:
+                queryset = queryset.prefetch_related(*self.relation_fields)
+            else:
+                queryset = queryset.prefetch_related(*(
+                    field for field in self.relation_fields if field in fields
+                )).only('id', *(
+                    field for field in fields
+                    if field not in self.relation_fields
+                ))
 
-    def get_queryset(self):
+        queryset = queryset.filter(user=self.request.user)
+        if 'rank' in queryset.query.annotations:
+            return queryset.order_by('-rank', '-id')
+
+        return queryset.order_by('-id')
+
+    def get_requested_fields(self):
         """
-        Return the recipies w.r.t the authenticated user
+        Return the fields asked for with ?fields= on reads, None for all
         """
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ids(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ids(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        value = self.request.query_params.get('fields')
+        if self.action not in ('list', 'retrieve') or not value:
+            return None
+
+        allowed = self.get_serializer_class().Meta.fields
+        fields = {field.strip() for field in value.split(',')} - {''}
+        if not fields:
+            return None
+        unknown = sorted(fields - set(allowed))
+        if unknown:
+            raise ValidationError({'fields': [
+                f'Unknown fields {", ".join(unknown)}, choose from '
+                f'{", ".join(allowed)}.'
+            ]})
+
+        return tuple(field for field in allowed if field in fields)
+
+    def get_requested_expansions(self):
+        """
+        Return the relations to nest on the list with ?expand=
+        """
+        value = self.request.query_params.get('expand')
+        if self.action != 'list' or not value:
+            return ()
 
-        return queryset.filter(user=self.request.user)
+        expand = {field.strip() for field in value.split(',')} - {''}
+        unknown = sorted(expand - set(self.relation_fields))
+        if unknown:
+            raise ValidationError({'expand': [
+                f'Unknown relations {", ".join(unknown)}, choose from '
+                f'{", ".join(self.relation_fields)}.'
+            ]})
+
+        return tuple(field for field in self.relation_fields
+                     if field in expand)
+
+    def get_serializer_context(self):
+        """
+        Pass the requested sparse fieldset to the serializer
+        """
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+
+        return context
 
     def get_serializer_class(self):
         """
@@ -90,9 +227,75 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk_create':
+            return serializers.RecipeBulkSerializer
+        elif self.action in ('bulk_attach', 'bulk_detach'):
+            return serializers.RecipeRelationBulkSerializer
 
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """
+        Return the recipes, or 304 when the client's copy is still current
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = conditional.list_validators(
+            request,
+            queryset,
+            self.get_requested_expansions()
+        )
+        response = conditional.not_modified_response(
+            request,
+            etag,
+            last_modified
+        )
+        if response is None:
+            response = self.list_values(queryset)
+            conditional.set_validators(response, etag, last_modified)
+
+        return response
+
+    def list_values(self, queryset):
+        """
+        Return a page of recipes serialized straight from values() rows
+
+        Skips model instances and per field serializer dispatch, which is
+        where most of the time of a large page goes.
+        """
+        serializer = serializers.RecipeValuesSerializer(
+            self.get_requested_fields(),
+            self.get_requested_expansions()
+        )
+        columns = serializer.columns
+        if 'rank' in queryset.query.annotations:
+            columns += ('rank',)
+
+        page = self.paginate_queryset(queryset.values(*columns))
+
+        return self.get_paginated_response(serializer.to_representation(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return a recipe, or 304 when the client's copy is still current
+        """
+        try:
+            queryset = self.filter_queryset(self.get_queryset()) \
+                .filter(pk=kwargs['pk'])
+        except (TypeError, ValueError):
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = conditional.detail_validators(request, queryset)
+        response = conditional.not_modified_response(
+            request,
+            etag,
+            last_modified
+        )
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+            conditional.set_validators(response, etag, last_modified)
+
+        return response
+
     def perform_create(self, serializer):
         """
         Create a new recipe object with user association of logged in user
@@ -102,7 +305,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """
-        Upload an image to a recipe
+        Upload an image to a recipe, processing it in the background
         """
         recipe = self.get_object()
         serializer = self.get_serializer(
@@ -111,13 +314,137 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
-            )
+            recipe = serializer.save()
+            data = serializer.data
+            schedule_image_processing(recipe)
+            return Response(data, status=status.HTTP_202_ACCEPTED)
 
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create many recipes at once, failing as a whole on any invalid one
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        recipes = serializer.save(user=request.user)
+        queryset = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).prefetch_related('tags', 'ingredients').order_by('id')
+
+        return Response(
+            serializers.RecipeSerializer(queryset, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def _bulk_relation(self, request, change):
+        """
+        Apply change to the related object and the selected recipes
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        recipes = Recipe.objects.filter(user=request.user)
+        if 'filter' in data:
+            recipes = filter_recipes(recipes, data['filter'])
+        else:
+            recipes = recipes.filter(id__in=data['recipes'])
+        count = change(recipes, data['field'], data['related'])
+
+        return Response({'updated': count})
+
+    @action(methods=['POST'], detail=False, url_path='attach')
+    def bulk_attach(self, request):
+        """
+        Add a tag or ingredient to many recipes at once
+        """
+        return self._bulk_relation(request, attach_related)
+
+    @action(methods=['POST'], detail=False, url_path='detach')
+    def bulk_detach(self, request):
+        """
+        Remove a tag or ingredient from many recipes at once
+        """
+        return self._bulk_relation(request, detach_related)
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """
+        Stream all recipes of the user as NDJSON or CSV
+        """
+        export_format = request.query_params.get('type', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'type': [f'Choose one of {", ".join(EXPORT_FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        encode, content_type = EXPORT_FORMATS[export_format]
+        recipes = iter_recipes(
+            self.get_queryset(),
+            settings.EXPORT_CHUNK_SIZE
+        )
+        response = StreamingHttpResponse(
+            encode(recipes),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{export_format}"'
+
+        return response
+
+
+class RecipeMediaView(APIView):
+    """
+    Serve the images and thumbnails of the recipes of the user
+
+    Any of the width, format and quality parameters on the url of a
+    processed image asks for a rendition of it instead, rendered on the
+    first request and cached on disk.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def perform_content_negotiation(self, request, force=False):
+        # Clients asking for images only must not be refused with a 406,
+        # the renderers are only used for the error responses
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, name):
+        """
+        Send the file if one of the recipes of the user references it
+        """
+        recipes = Recipe.objects.filter(user=request.user)
+        params = request.query_params
+        if not any(key in params for key in ('width', 'format', 'quality')):
+            if not recipes.filter(Q(image=name) | Q(thumbnail=name)).exists():
+                raise Http404
+            return serve_file(request, settings.MEDIA_ROOT, name)
+
+        serializer = serializers.RecipeRenditionSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        recipe = recipes.filter(
+            image=name,
+            image_status=Recipe.IMAGE_READY
+        ).first()
+        if recipe is None:
+            raise Http404
+        rendition = get_rendition(
+            recipe.image.storage,
+            name,
+            serializer.validated_data.get('width'),
+            serializer.validated_data['format'],
+            serializer.validated_data['quality']
+        )
+
+        return serve_file(request, settings.MEDIA_ROOT, rendition)
@@ -0,0 +1,99 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """
+    Set up Django in a freshly spawned worker process
+    """
+    import django
+    django.setup()
+
+
+def get_executor():
+    """
+    Return the process pool shared by the background jobs of this process
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+
+    return _executor
+
+
+def log_failure(future):
+    """
+    Done callback logging the exception a background job raised
+    """
+    if not future.cancelled() and future.exception() is not None:
+        exc = future.exception()
+        logger.error(
+            'Background job failed',
+            exc_info=(type(exc), exc, exc.__traceback__)
+        )
+
+
+def _discard_executor(executor):
+    """
+    Drop the broken process pool so the next job starts a new one
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _submit(func, *args):
+    """
+    Queue func in the process pool and log its failure
+
+    A worker dying breaks the pool for good, the job is then retried once
+    in a new pool. Jobs that cannot be queued are logged rather than
+    raised, as the transaction they follow is already committed.
+    """
+    for attempt in range(2):
+        executor = get_executor()
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            if attempt:
+                logger.exception('Background job could not be queued')
+                return
+        else:
+            future.add_done_callback(log_failure)
+            return
+
+
+def submit(func, *args):
+    """
+    Run func in a worker process once the current transaction commits
+
+    With IMAGE_PIPELINE['EAGER'] set the job runs inline instead, which is
+    what the tests use. Its failure is logged either way.
+    """
+    if settings.IMAGE_PIPELINE['EAGER']:
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('Background job failed')
+        return
+
+    transaction.on_commit(lambda: _submit(func, *args))
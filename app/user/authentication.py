@@ -0,0 +1,128 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    """
+    Thread safe in-process LRU of token keys with a time to live
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for the key or None when missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+
+            return value
+
+    def set(self, key, value):
+        """
+        Cache the value and evict the least recently used entries
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove the key from the cache
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE['MAX_ENTRIES'],
+    settings.TOKEN_AUTH_CACHE['TTL']
+)
+
+
+def _shared_cache():
+    """
+    Return the shared cache backend or None when it is not configured
+    """
+    alias = settings.TOKEN_AUTH_CACHE['SHARED_CACHE_ALIAS']
+
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    """
+    Return the shared cache key for a token without exposing the token
+    """
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def invalidate_token(key):
+    """
+    Drop a token from the in-process and the shared cache
+    """
+    token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that caches the token and user lookup
+    """
+
+    def authenticate_credentials(self, key):
+        """
+        Return the user and token for the key, querying only on a miss
+
+        With a shared cache configured it is read on every request, so a
+        token invalidated by any process stops working everywhere at
+        once. The in-process cache is only used without one.
+        """
+        shared = _shared_cache()
+        if shared is not None:
+            credentials = shared.get(_shared_key(key))
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                shared.set(
+                    _shared_key(key),
+                    credentials,
+                    settings.TOKEN_AUTH_CACHE['SHARED_TTL']
+                )
+        else:
+            credentials = token_cache.get(key)
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                token_cache.set(key, credentials)
+
+        # Hand out a copy so request code cannot mutate the cached user
+        return copy.deepcopy(credentials)
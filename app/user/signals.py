@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Stop authenticating with a token as soon as it is deleted
+    """
+    invalidate_token(instance.key)
+
+
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """
+    Refresh the cached tokens of a user whenever the user changes
+    """
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        invalidate_token(key)
+
+
+def connect():
+    """
+    Connect the token cache invalidation receivers
+    """
+    post_delete.connect(invalidate_deleted_token, sender=Token)
+    post_save.connect(invalidate_user_tokens, sender=get_user_model())
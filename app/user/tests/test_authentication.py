@@ -0,0 +1,167 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user.authentication import TokenCache, token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Test authenticating API requests with cached tokens
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@admin.com',
+            password='testpass',
+            name='name'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        """
+        Test the token is only looked up in the database once
+        """
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """
+        Test an unknown token is rejected
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """
+        Test a cached token stops working once it is deleted
+        """
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """
+        Test a cached token stops working once its user is deactivated
+        """
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_refreshes_cached_user(self):
+        """
+        Test the cached user reflects updates made through the API
+        """
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'new name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+
+
+@override_settings(TOKEN_AUTH_CACHE=dict(
+    settings.TOKEN_AUTH_CACHE,
+    SHARED_CACHE_ALIAS='default'
+))
+class SharedCachedTokenAuthenticationTests(TestCase):
+    """
+    Test authenticating with tokens cached in a shared cache
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@admin.com',
+            password='testpass'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_is_cached(self):
+        """
+        Test the token is only looked up in the database once
+        """
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_token_deleted_by_other_process_rejected(self):
+        """
+        Test a token deleted in another process stops working at once
+        """
+        self.client.get(ME_URL)
+
+        # The other process only clears its own in-process entry
+        with patch.object(token_cache, 'delete'):
+            self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenCacheTests(TestCase):
+    """
+    Test the in-process token cache
+    """
+
+    def test_least_recently_used_evicted(self):
+        """
+        Test the least recently used entry is evicted when full
+        """
+        cache = TokenCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('time.monotonic')
+    def test_expired_entry_dropped(self, monotonic):
+        """
+        Test entries are not returned after their time to live
+        """
+        monotonic.return_value = 100
+        cache = TokenCache(max_entries=2, ttl=60)
+        cache.set('a', 1)
+
+        monotonic.return_value = 161
+
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from user.throttling import ConcurrencyLimiter, password_checks
+
+TOKEN_URL = reverse('user:token')
+
+
+def login_throttle(**params):
+    """
+    Return the login throttle settings updated with params
+    """
+    return dict(settings.LOGIN_THROTTLE, **params)
+
+
+class LoginThrottleTests(TestCase):
+    """
+    Test throttling of the token endpoint
+    """
+
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user(
+            email='test@admin.com',
+            password='testpass'
+        )
+        self.client = APIClient()
+
+    def test_non_object_body_rejected(self):
+        """
+        Test a JSON body that is not an object is a bad request
+        """
+        res = self.client.post(TOKEN_URL, [1, 2], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LOGIN_THROTTLE=login_throttle(
+        EMAIL_BURST=2,
+        EMAIL_PER_MINUTE=1
+    ))
+    def test_throttle_per_email(self):
+        """
+        Test attempts on one email are throttled whatever the address
+        """
+        payload = {'email': 'Test@admin.com', 'password': 'wrong'}
+
+        for address in ('10.0.0.1', '10.0.0.2'):
+            res = self.client.post(TOKEN_URL, payload, REMOTE_ADDR=address)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@admin.com', 'password': 'testpass'},
+            REMOTE_ADDR='10.0.0.3'
+        )
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'other@admin.com', 'password': 'testpass'},
+            REMOTE_ADDR='10.0.0.3'
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LOGIN_THROTTLE=login_throttle(
+        IP_BURST=2,
+        IP_PER_MINUTE=1
+    ))
+    def test_throttle_per_address(self):
+        """
+        Test attempts from one address are throttled whatever the email
+        """
+        for i in range(2):
+            res = self.client.post(
+                TOKEN_URL,
+                {'email': f'user{i}@admin.com', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1'
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        payload = {'email': 'test@admin.com', 'password': 'testpass'}
+        res = self.client.post(TOKEN_URL, payload, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(TOKEN_URL, payload, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_THROTTLE=login_throttle(
+        IP_BURST=2,
+        IP_PER_MINUTE=1
+    ))
+    def test_forwarded_for_not_trusted(self):
+        """
+        Test a spoofed X-Forwarded-For does not give a fresh bucket
+        """
+        payload = {'email': 'test@admin.com', 'password': 'wrong'}
+        for i in range(2):
+            self.client.post(
+                TOKEN_URL,
+                payload,
+                REMOTE_ADDR='10.0.0.1',
+                HTTP_X_FORWARDED_FOR=f'192.168.0.{i}'
+            )
+
+        res = self.client.post(
+            TOKEN_URL,
+            payload,
+            REMOTE_ADDR='10.0.0.1',
+            HTTP_X_FORWARDED_FOR='192.168.0.9'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_concurrent_password_checks_bounded(self):
+        """
+        Test logins are refused without a password check when slots run out
+        """
+        taken = 0
+        try:
+            while password_checks.try_acquire():
+                taken += 1
+            with self.assertNumQueries(0):
+                res = self.client.post(
+                    TOKEN_URL,
+                    {'email': 'test@admin.com', 'password': 'testpass'}
+                )
+        finally:
+            for _ in range(taken):
+                password_checks.release()
+
+        self.assertEqual(taken, settings.LOGIN_THROTTLE['MAX_CONCURRENT'])
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(
+            TOKEN_URL,
+            {'email': 'test@admin.com', 'password': 'testpass'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
+    def test_concurrency_limiter_slot_released(self):
+        """
+        Test a slot is given back when the block raises
+        """
+        limiter = ConcurrencyLimiter(1)
+
+        with self.assertRaises(ValueError):
+            with limiter.slot():
+                raise ValueError
+
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
@@ -25,6 +26,7 @@ class PublicUserApiTests(TestCase):
     """
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle allowing bursts of `burst` requests refilled at a steady rate
+
+    The bucket of each key lives in the login throttle cache as a pair of
+    the remaining tokens and the time they were counted. Concurrent
+    requests for the same key may both take the last token, which is
+    acceptable for a throttle.
+    """
+    scope = None
+
+    def __init__(self):
+        config = settings.LOGIN_THROTTLE
+        self.cache = caches[config['CACHE_ALIAS']]
+        self.burst = config[f'{self.scope}_BURST']
+        self.rate = config[f'{self.scope}_PER_MINUTE'] / 60
+        self.wait_time = None
+
+    def get_cache_key(self, request, view):
+        """
+        Return the key of the bucket to draw from, or None to not throttle
+        """
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        """
+        Take a token from the bucket of the request, if one is left
+        """
+        key = self.get_cache_key(request, view)
+        if key is None or self.burst <= 0:
+            return True
+
+        now = time.time()
+        tokens, stamp = self.cache.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_time = (1 - tokens) / self.rate if self.rate else None
+
+        refill_time = (self.burst - tokens) / self.rate if self.rate else None
+        self.cache.set(
+            key,
+            (tokens, now),
+            None if refill_time is None else int(refill_time) + 1
+        )
+
+        return allowed
+
+    def wait(self):
+        """
+        Return the seconds until the bucket holds a token again
+        """
+        return self.wait_time
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    """
+    Throttle login attempts per client address
+    """
+    scope = 'IP'
+
+    def get_cache_key(self, request, view):
+        return f'throttle:login:ip:{self.get_ident(request)}'
+
+
+class LoginEmailThrottle(TokenBucketThrottle):
+    """
+    Throttle login attempts per account email, whatever the client address
+    """
+    scope = 'EMAIL'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            # Left for the serializer to reject
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+        return f'throttle:login:email:{digest}'
+
+
+class ConcurrencyLimiter:
+    """
+    Per process cap on how many callers run a section at the same time
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(max(limit, 1))
+
+    def try_acquire(self):
+        """
+        Take a slot without waiting, returning whether one was free
+        """
+        return self.limit <= 0 or self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        """
+        Give back a slot taken with try_acquire
+        """
+        if self.limit > 0:
+            self._semaphore.release()
+
+    @contextmanager
+    def slot(self):
+        """
+        Run the block in a slot, raising Throttled when none is free
+        """
+        if not self.try_acquire():
+            raise Throttled(wait=1)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+password_checks = ConcurrencyLimiter(settings.LOGIN_THROTTLE['MAX_CONCURRENT'])
@@ -1,5 +1,8 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
+from user.throttling import LoginEmailThrottle, LoginIPThrottle, \
+                            password_checks
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -17,6 +20,14 @@ class CreateTokenView(ObtainAuthToken):
     """
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Check the credentials, answering 429 when too many checks are running
+        """
+        with password_checks.slot():
+            return super().post(request, *args, **kwargs)
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
@@ -24,7 +35,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     Manage the authenticated user
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):